@@ -1,25 +1,23 @@
-from pages.document_page import DocumentBuilder, generate_person
-from datetime import datetime
-from xml.dom import minidom
-import xml.etree.ElementTree as ET
+import os
+import sys
 
-def prettify(elem):
-    rough = ET.tostring(elem, encoding="utf-8")
-    reparsed = minidom.parseString(rough)
-    return reparsed.toprettyxml(indent="    ", encoding="utf-8").decode("utf-8")
+# Общие модули (writer, пулы значений) лежат в корне репозитория рядом с gen.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-if __name__ == "__main__":
-    now = datetime.now()
-    date_str = now.strftime("%Y-%m-%d")
-    timestamp = now.strftime("%Y%m%d_%H%M%S")
-    base_id = "YP01MM000001"
-    reg_number = f"{base_id}_{timestamp}"
+from pages.document_page import render_document
+
+import gen
 
-    person = generate_person()
-    doc = DocumentBuilder(person, reg_number, date_str).build()
-    xml = prettify(doc)
+# Генератор на page object API: те же параметры, процессы, приемники,
+# метрики и зерна, что у gen.py, но документ пишет DocumentBuilder.
+# При одном --seed документы совпадают с gen.py по содержимому, отличается
+# только оформление (атрибуты корня в строку, перевод строки в конце).
+# События, зарегистрированные через register_event_page, доступны в --event-mix.
 
-    with open(f"{reg_number}.xml", "w", encoding="utf-8") as f:
-        f.write(xml)
+if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        from multiprocessing import freeze_support
 
-    print(f"✅ Документ создан: {reg_number}.xml")
+        freeze_support()
+    gen.main(gen.parse_args("Генерация файлов событий (page object)", template=False),
+             render_document)
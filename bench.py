@@ -0,0 +1,208 @@
+from datetime import datetime
+from functools import partial
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import faker
+
+import engine
+from xml_writer import XmlWriter
+
+# Бенчмарки горячих путей генератора.
+#   python -m pytest benchmarks --bench-out bench.json --bench-baseline base.json
+#   python bench.py run --out bench.json          то же без pytest
+#   python bench.py compare base.json bench.json  поиск регрессий относительно базы
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "Gen_Events_page_Object"))
+from pages import document_page  # noqa: E402
+
+DATE_STR = "2024-05-17"
+REG_NUMBER = "YP01MM000001_BENCH"
+DOCUMENT_SIZES = (1, 10, 100)
+
+# Для latency и memory рост значения - это ухудшение, для throughput - падение
+KINDS = {"latency": "us/op", "throughput": "docs/s", "memory": "KiB"}
+
+
+def seed(value=42):
+    engine.fake.seed_instance(value)
+
+
+def measure(func, number, rounds):
+    # Берется лучший раунд: фоновые помехи только замедляют, но не ускоряют
+    times = []
+    for _ in range(rounds):
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - started) / number)
+    return min(times)
+
+
+def peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def latency_cases():
+    person = engine.generate_random_person()
+    document = engine.build_document(person, REG_NUMBER, DATE_STR)
+    po_person = document_page.generate_person()
+    return {
+        "generate_random_person": engine.generate_random_person,
+        "generate_valid_inn": engine.generate_valid_inn,
+        "generate_valid_snils": engine.generate_valid_snils,
+        "generate_valid_inns_x1000": lambda: engine.generate_valid_inns(1000),
+        "build_document": lambda: engine.build_document(person, REG_NUMBER, DATE_STR),
+        "prettify": lambda: engine.prettify(document),
+        "DocumentBuilder.build": lambda: document_page.DocumentBuilder(
+            po_person, REG_NUMBER, DATE_STR).build(),
+    }
+
+
+def write_stream(out, subjects):
+    engine.stream_document(XmlWriter(out, multiline_root=True), REG_NUMBER, DATE_STR, subjects)
+
+
+def write_template(out, subjects):
+    engine.render_document(out, REG_NUMBER, DATE_STR, subjects)
+
+
+def docs_per_sec(write, subjects, number, rounds):
+    with open(os.devnull, "w", encoding="utf-8") as null:
+        return 1 / measure(lambda: write(null, subjects), max(1, number // subjects), rounds)
+
+
+def tree_peak(subjects):
+    return peak_memory(lambda: engine.prettify(build_multi(subjects)))
+
+
+def stream_peak(subjects):
+    return peak_memory(lambda: write_stream(io.StringIO(), subjects))
+
+
+def benchmarks(number=200, rounds=5, sizes=DOCUMENT_SIZES):
+    # Имя -> (вид, замер); замер возвращает значение в единицах KINDS[вид]
+    seed()
+    cases = {}
+    for name, func in latency_cases().items():
+        cases[name] = ("latency", lambda func=func: measure(func, number, rounds) * 1e6)
+    for subjects in sizes:
+        for label, write in (("stream", write_stream), ("template", write_template)):
+            cases[f"{label}_docs_per_sec[subjects={subjects}]"] = (
+                "throughput", partial(docs_per_sec, write, subjects, number, rounds))
+    # Пиковая память: документ целиком в дереве против потоковой записи
+    for subjects in sizes:
+        cases[f"build_document_peak[subjects={subjects}]"] = (
+            "memory", partial(tree_peak, subjects))
+        cases[f"stream_document_peak[subjects={subjects}]"] = (
+            "memory", partial(stream_peak, subjects))
+    return cases
+
+
+def result(kind, value):
+    return {"kind": kind, "unit": KINDS[kind], "value": round(value, 3)}
+
+
+def run(number, rounds, sizes):
+    results = {}
+    for name, (kind, bench) in benchmarks(number, rounds, sizes).items():
+        results[name] = result(kind, bench())
+        print(f"{name:<42} {results[name]['value']:>12.1f} {KINDS[kind]}")
+    return results
+
+
+def build_multi(subjects):
+    # Дерево со всеми субъектами в памяти - то, чего избегает stream_document
+    document = engine.build_document(engine.generate_random_person(), REG_NUMBER, DATE_STR)
+    data = document.find("Data")
+    for _ in range(subjects - 1):
+        data.append(engine.build_subject_entry(engine.generate_random_person(), DATE_STR))
+    return document
+
+
+def change(base, cur):
+    # (относительное изменение, ухудшение): ухудшение положительно в обе стороны
+    if not base["value"]:
+        return 0.0, 0.0
+    delta = (cur["value"] - base["value"]) / base["value"]
+    return delta, -delta if base["kind"] == "throughput" else delta
+
+
+def compare(baseline, current, threshold):
+    # Бенчмарк из базы, которого нет в текущем прогоне, тоже считается
+    # регрессией: удаленный или сломанный замер не должен пропадать молча
+    regressions = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            print(f"{name:<42} {base['value']:>12.1f} -> {'-':>12} {base['unit']:<7}"
+                  f" {'':>7} MISSING")
+            regressions.append(name)
+            continue
+        delta, worse = change(base, cur)
+        flag = "REGRESSION" if worse > threshold else ""
+        print(f"{name:<42} {base['value']:>12.1f} -> {cur['value']:>12.1f} {base['unit']:<7}"
+              f" {delta:+7.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def environment():
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "faker": faker.VERSION,
+        "platform": platform.platform(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарки генератора событий")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="выполнить замеры")
+    run_parser.add_argument("--out", default="bench.json", help="файл результатов JSON")
+    run_parser.add_argument("--number", type=int, default=200, help="вызовов в раунде")
+    run_parser.add_argument("--rounds", type=int, default=5)
+    run_parser.add_argument("--sizes", default=",".join(map(str, DOCUMENT_SIZES)),
+                            help="число субъектов в документе, через запятую")
+
+    compare_parser = commands.add_parser("compare", help="сравнить с базовым прогоном")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15,
+                                help="допустимое ухудшение, доля (0.15 = 15%%)")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        sizes = [int(size) for size in args.sizes.split(",")]
+        report = {"environment": environment(), "results": run(args.number, args.rounds, sizes)}
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.out}")
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"Регрессий: {len(regressions)}")
+            sys.exit(1)
+        print("Регрессий нет")
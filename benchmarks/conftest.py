@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bench  # noqa: E402
+
+# Бенчмарки под pytest: по тесту на замер из bench.benchmarks().
+#   python -m pytest benchmarks --bench-out bench.json
+#   python -m pytest benchmarks --bench-baseline base.json --bench-threshold 0.15
+# С базой ухудшение сверх порога и пропавший замер - упавший тест.
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench", "бенчмарки генератора")
+    group.addoption("--bench-out", help="сохранить результаты в JSON")
+    group.addoption("--bench-baseline", help="базовый прогон JSON для поиска регрессий")
+    group.addoption("--bench-threshold", type=float, default=0.15,
+                    help="допустимое ухудшение, доля (0.15 = 15%%)")
+    group.addoption("--bench-number", type=int, default=200, help="вызовов в раунде")
+    group.addoption("--bench-rounds", type=int, default=5)
+    group.addoption("--bench-sizes", default=",".join(map(str, bench.DOCUMENT_SIZES)),
+                    help="число субъектов в документе, через запятую")
+
+
+def pytest_configure(config):
+    config.bench_results = {}
+    config.bench_baseline = {}
+    path = config.getoption("--bench-baseline")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            config.bench_baseline = json.load(f)["results"]
+
+
+def pytest_generate_tests(metafunc):
+    if "bench_name" not in metafunc.fixturenames:
+        return
+    config = metafunc.config
+    sizes = [int(size) for size in config.getoption("--bench-sizes").split(",")]
+    config.bench_cases = bench.benchmarks(config.getoption("--bench-number"),
+                                          config.getoption("--bench-rounds"), sizes)
+    # Замеры из базы, которых больше нет, тоже становятся тестами - и падают
+    names = list(config.bench_cases)
+    names += [name for name in config.bench_baseline if name not in config.bench_cases]
+    metafunc.parametrize("bench_name", names)
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    path = config.getoption("--bench-out")
+    if path and config.bench_results:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"environment": bench.environment(), "results": config.bench_results}, f,
+                      ensure_ascii=False, indent=2)
@@ -0,0 +1,17 @@
+import pytest
+
+import bench
+
+
+def test_benchmark(bench_name, request):
+    config = request.config
+    case = config.bench_cases.get(bench_name)
+    if case is None:
+        pytest.fail(f"{bench_name} is in the baseline but missing from the current run")
+    kind, measure = case
+    current = config.bench_results[bench_name] = bench.result(kind, measure())
+    base = config.bench_baseline.get(bench_name)
+    if base is not None:
+        delta, worse = bench.change(base, current)
+        assert worse <= config.getoption("--bench-threshold"), \
+            f"{bench_name}: {base['value']} -> {current['value']} {current['unit']} ({delta:+.1%})"
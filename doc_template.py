@@ -0,0 +1,78 @@
+import io
+import re
+
+from xml_writer import XmlWriter, escape
+
+# Шаблоны фрагментов документа со слотами под динамические значения.
+# Фрагмент один раз выводится через XmlWriter с маркерами вместо значений,
+# поэтому разметка и отступы в точности совпадают с выводом дерева
+# ElementTree, а при генерации остается только подставить значения.
+
+SLOT_START = "\ue000"
+SLOT_END = "\ue001"
+SLOT_RE = re.compile(f"{SLOT_START}([A-Za-z0-9_]+){SLOT_END}")
+
+
+def slot(name):
+    return f"{SLOT_START}{name}{SLOT_END}"
+
+
+class SlotValues(dict):
+    # Подставляется вместо словаря значений при компиляции:
+    # values["lastName"] возвращает маркер слота prefix + "lastName"
+    def __init__(self, prefix=""):
+        super().__init__()
+        self.prefix = prefix
+
+    def __missing__(self, key):
+        return slot(self.prefix + key)
+
+
+class Template:
+    def __init__(self, text):
+        parts = SLOT_RE.split(text)
+        fmt = []
+        for i, part in enumerate(parts):
+            if i % 2:
+                fmt.append("{" + part + "}")
+            else:
+                fmt.append(part.replace("{", "{{").replace("}", "}}"))
+        self.text = text if len(parts) == 1 else None
+        self.slots = tuple(dict.fromkeys(parts[1::2]))
+        self._format = "".join(fmt).format_map
+
+    def render(self, values):
+        # values должны быть уже экранированы (escape_values)
+        if self.text is not None:
+            return self.text
+        return self._format(values)
+
+
+def escape_values(values, prefix="", into=None):
+    result = {} if into is None else into
+    for key, value in values.items():
+        result[prefix + key] = escape(value)
+    return result
+
+
+class FragmentCompiler:
+    # Накапливает вывод XmlWriter и по cut() превращает его в шаблон.
+    # Состояние writer (глубина, первая строка) сохраняется между фрагментами.
+    def __init__(self, pretty=True, multiline_root=False):
+        self.buf = io.StringIO()
+        self.writer = XmlWriter(self.buf, pretty=pretty, multiline_root=multiline_root)
+
+    def cut(self):
+        text = self.buf.getvalue()
+        self.buf.seek(0)
+        self.buf.truncate()
+        return Template(text)
+
+
+def fragment_writer(out, pretty, depth):
+    # Writer для вставки поддерева посреди уже начатого документа
+    writer = XmlWriter(out, pretty=pretty)
+    writer.depth = depth
+    writer.started = True
+    return writer
+
@@ -0,0 +1,709 @@
+import xml.etree.ElementTree as ET
+from datetime import date, timedelta
+from faker import Faker
+from itertools import accumulate
+import metrics
+from doc_template import FragmentCompiler, SlotValues, escape_values, fragment_writer, slot
+from persons import Person
+from uid_factory import UidFactory
+from value_pools import parse_date_offset, split_name
+from xml_writer import XmlWriter, escape
+import hashlib
+import io
+import math
+import random
+import sys
+
+# Ядро генерации: значения субъектов и событий, реестр событий, построение
+# и потоковая запись документа, шаблонный путь. Состояние процесса (Faker,
+# пулы, UID, дата отсчета) живет здесь и меняется через use_*.
+# gen.py, pipeline.py, server.py и page object из Gen_Events_page_Object
+# - обертки над этим модулем.
+
+# --- Инициализация ---
+# Подключаются только провайдеры, которые реально используются: Faker по
+# умолчанию загружает все 25 и для каждого ищет модуль локали, а это
+# заметная часть времени запуска.
+FAKER_PROVIDERS = [
+    "faker.providers.person",
+    "faker.providers.address",
+    "faker.providers.company",
+    "faker.providers.date_time",
+]
+fake = Faker("ru_RU", providers=FAKER_PROVIDERS)
+
+# Дата, от которой отсчитываются относительные диапазоны дат ("-15y", "today").
+# None - текущая дата; при --seed фиксируется, чтобы повторный запуск совпадал.
+anchor_date = None
+
+
+def use_anchor_date(value):
+    global anchor_date
+    anchor_date = value
+
+
+def today():
+    return anchor_date or date.today()
+
+
+# --- Детерминированная генерация ---
+# Все случайные значения берутся из fake.random, поэтому одно зерно
+# задает и Faker, и UID. Для документа i зерно выводится из (seed, i):
+# документ не зависит от того, какой шард или воркер его сгенерировал.
+def derive_seed(seed, *keys):
+    digest = hashlib.blake2b(repr((seed, *keys)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def seed_streams(value):
+    fake.seed_instance(value)
+    random.seed(value)
+
+
+# По умолчанию UID берутся из fake.random и воспроизводятся вместе с зерном.
+# gen.setup_process без зерна переключает на пачки из os.urandom.
+uids = UidFactory(fake)
+
+
+def use_uids(factory):
+    global uids
+    uids = factory
+
+
+def generate_uid_with_suffix():
+    return uids.uid()
+
+
+def generate_uids(count):
+    # UID пачкой на все события субъекта (EventMix.event_values)
+    return uids.uids(count)
+
+
+
+# --- Валидаторы ИНН и СНИЛС ---
+INN_COEFFS_1 = (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+INN_COEFFS_2 = (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+SNILS_COEFFS = (9, 8, 7, 6, 5, 4, 3, 2, 1)
+
+
+def inn_check_digits(prefix: str) -> str:
+    # Контрольные цифры для первых 10 цифр ИНН физлица
+    n1 = sum(int(d) * c for d, c in zip(prefix, INN_COEFFS_1)) % 11 % 10
+    n2 = (sum(int(d) * c for d, c in zip(prefix, INN_COEFFS_2)) + n1 * 8) % 11 % 10
+    return f"{n1}{n2}"
+
+
+def snils_check_sum(s: int) -> int:
+    # Контрольное число по взвешенной сумме первых 9 цифр СНИЛС
+    if s < 100:
+        return s
+    if s in (100, 101):
+        return 0
+    check = s % 101
+    return 0 if check in (100, 101) else check
+
+
+# Проверка и генерация считают контрольные цифры одними и теми же функциями
+def validate_inn(inn: str) -> bool:
+    if len(inn) != 12 or not inn.isdigit():
+        return False
+    return inn[10:] == inn_check_digits(inn[:10])
+
+def validate_snils(snils: str) -> bool:
+    if len(snils) != 11 or not snils.isdigit():
+        return False
+    s = sum(int(d) * w for d, w in zip(snils[:9], SNILS_COEFFS))
+    return snils_check_sum(s) == int(snils[9:])
+
+# --- Уникальные идентификаторы ---
+# unique_ids.UniqueIds или None: при gen.py --unique ИНН, СНИЛС, паспорта
+# и UID берутся из непересекающихся диапазонов документа, а не из fake.random
+unique = None
+
+
+def use_unique(ids):
+    global unique
+    unique = ids
+
+
+def random_passport():
+    # (серия, номер) паспорта
+    if unique is not None:
+        return unique.passport()
+    return str(fake.random_int(1000, 9999)), str(fake.random_int(100000, 999999))
+
+
+# --- Генерация валидных значений ---
+# Контрольные цифры вычисляются из случайного префикса, без перебора
+def generate_valid_inn():
+    if unique is not None:
+        prefix = str(10**9 + unique.next("inn"))
+    else:
+        prefix = str(fake.random.randrange(10**9, 10**10))
+    return prefix + inn_check_digits(prefix)
+
+def generate_valid_snils():
+    if unique is not None:
+        prefix = str(10**8 + unique.next("snils"))
+    else:
+        prefix = str(fake.random.randrange(10**8, 10**9))
+    s = sum(int(d) * w for d, w in zip(prefix, SNILS_COEFFS))
+    return f"{prefix}{snils_check_sum(s):02d}"
+
+
+# Пакетные варианты: префикс делится на старшую и младшую половины,
+# взвешенные суммы половин берутся из заранее посчитанных таблиц
+_weight_tables = {}
+
+
+def weight_table(coeffs):
+    table = _weight_tables.get(coeffs)
+    if table is None:
+        table = [0]
+        for c in reversed(coeffs):
+            # Добавляем очередную старшую цифру ко всем уже посчитанным суффиксам
+            table = [d * c + t for d in range(10) for t in table]
+        _weight_tables[coeffs] = table
+    return table
+
+
+def generate_valid_inns(count):
+    if unique is not None:
+        return [generate_valid_inn() for _ in range(count)]
+    hi_1, lo_1 = weight_table(INN_COEFFS_1[:5]), weight_table(INN_COEFFS_1[5:])
+    hi_2, lo_2 = weight_table(INN_COEFFS_2[:5]), weight_table(INN_COEFFS_2[5:10])
+    rnd = fake.random.randrange
+    result = []
+    for _ in range(count):
+        hi, lo = rnd(10**4, 10**5), rnd(10**5)
+        n1 = (hi_1[hi] + lo_1[lo]) % 11 % 10
+        n2 = (hi_2[hi] + lo_2[lo] + n1 * 8) % 11 % 10
+        result.append(f"{hi:05d}{lo:05d}{n1}{n2}")
+    return result
+
+
+def generate_valid_snilses(count):
+    if unique is not None:
+        return [generate_valid_snils() for _ in range(count)]
+    hi_w, lo_w = weight_table(SNILS_COEFFS[:4]), weight_table(SNILS_COEFFS[4:])
+    rnd = fake.random.randrange
+    result = []
+    for _ in range(count):
+        hi, lo = rnd(10**3, 10**4), rnd(10**5)
+        result.append(f"{hi:04d}{lo:05d}{snils_check_sum(hi_w[hi] + lo_w[lo]):02d}")
+    return result
+
+# --- Источники значений: Faker напрямую или заранее сгенерированные пулы ---
+pools = None
+
+
+def use_pools(value_pools):
+    # value_pools - ValuePools или None для прямых вызовов Faker
+    global pools
+    pools = value_pools
+
+
+def random_name():
+    if pools is not None:
+        return pools.name()
+    return split_name(fake.name())
+
+def random_city():
+    if pools is not None:
+        return pools.city()
+    return fake.city().upper()
+
+def random_issuer():
+    if pools is not None:
+        return pools.issuer()
+    return fake.company().upper()
+
+def random_date(start, end):
+    if pools is not None:
+        return pools.date(start, end)
+    anchor = today()
+    return fake.date_between(start_date=parse_date_offset(start, anchor),
+                             end_date=parse_date_offset(end, anchor)).strftime('%Y-%m-%d')
+
+def random_birth_date():
+    # Возраст 18-99 лет на дату отсчета, как у fake.date_of_birth
+    return random_date('-100y', '-18y')
+
+def random_date_before(end, days):
+    if pools is not None:
+        return (end - timedelta(days=fake.random.randint(0, days))).isoformat()
+    return fake.date_between(start_date=end - timedelta(days=days), end_date=end).strftime('%Y-%m-%d')
+
+
+# --- Генерация случайного субъекта ---
+def generate_random_person():
+    # Запись Person (persons.py) читается как словарь с ключами PERSON_FIELDS
+    last_name, first_name, middle_name = random_name()
+    return Person(
+        last_name,
+        first_name,
+        middle_name,
+        random_birth_date(),
+        random_city(),
+        *random_passport(),
+        random_date('-15y', '-1y'),
+        random_issuer(),
+        f"{fake.random_int(100,999)}-{fake.random_int(100,999)}",
+        generate_valid_inn(),
+        generate_valid_snils()
+    )
+
+def generate_prev_name():
+    last_name, first_name, middle_name = random_name()
+    return {
+        "lastName": last_name,
+        "firstName": first_name,
+        "middleName": middle_name,
+        "date": random_date('-20y', '-10y')
+    }
+
+def generate_prev_doc():
+    country_code = str(fake.random_int(100, 899))
+    doc_series, doc_num = random_passport()
+    return {
+        "countryCode": country_code,
+        "docCode": "21",
+        "docSeries": doc_series,
+        "docNum": doc_num,
+        "issueDate": random_date('-15y', '-5y'),
+        "docIssuer": random_issuer(),
+        "deptCode": f"{fake.random_int(100,999)}-{fake.random_int(100,999)}",
+        "endDate": random_date('today', '+10y')
+    }
+
+
+# --- Реестр типов событий ---
+# Код события -> (values, element): values(event_date, order_num, uid) разыгрывает
+# случайные значения события, element(values) строит по ним XML-элемент.
+# uid заявки EventMix берет одной пачкой на все события субъекта; при uid=None
+# values берет его сам.
+# Шаблонный путь использует те же values, но без построения дерева.
+EVENT_TYPES = {}
+# События, которые шаблонный путь пишет через ElementTree: их values
+# возвращают не словарь, и шаблон из них не собрать (страницы page object)
+TREE_EVENTS = set()
+EVENT_SPAN_DAYS = 365
+
+
+def register_event(code, values, template=True):
+    def decorator(element):
+        EVENT_TYPES[code] = (values, element)
+        if template:
+            TREE_EVENTS.discard(code)
+        else:
+            TREE_EVENTS.add(code)
+        return element
+    return decorator
+
+
+# --- Генерация события FL_Event_1_1 ---
+def fl_event_1_1_values(date_str, order_num=1, uid=None):
+    loan_sum = f"{fake.random_int(100000, 1000000):.2f}"
+
+    # Проверка UID включается через --validate-uids
+    if uid is None:
+        uid = generate_uid_with_suffix()
+
+    # Заявка подана не позже даты события
+    application_date = random_date_before(date.fromisoformat(date_str), 30)
+    return {
+        "orderNum": str(order_num),
+        "eventDate": date_str,
+        "sum": loan_sum,
+        "uid": uid,
+        "applicationDate": application_date,
+        "num": application_date.replace("-", "") + f"-{fake.random_int(10000,99999)}"
+    }
+
+
+@register_event("FL_Event_1_1", fl_event_1_1_values)
+def fl_event_1_1_element(values):
+    # operationCode, stageCode и stageDate задаются только при изменении уже
+    # отправленной заявки (registry.py); для нового события - значения по умолчанию
+    fl_event = ET.Element("FL_Event_1_1", {
+        "operationCode": values.get("operationCode", "A"),
+        "orderNum": values["orderNum"],
+        "eventDate": values["eventDate"]
+    })
+
+    application = ET.SubElement(fl_event, "FL_55_Application")
+    ET.SubElement(application, "role").text = "1"
+    ET.SubElement(application, "sum").text = values["sum"]
+    ET.SubElement(application, "currency").text = "RUB"
+    ET.SubElement(application, "uid").text = values["uid"]
+
+    application_date = values["applicationDate"]
+    ET.SubElement(application, "applicationDate").text = application_date
+    ET.SubElement(application, "sourceCode").text = "1"
+    ET.SubElement(application, "wayCode").text = "6"
+    ET.SubElement(application, "stageEndDate").text = application_date
+    ET.SubElement(application, "purposeCode").text = "2"
+    ET.SubElement(application, "stageCode").text = values.get("stageCode", "1")
+    ET.SubElement(application, "stageDate").text = values.get("stageDate", application_date)
+    ET.SubElement(application, "applicationCode").text = "6"
+    ET.SubElement(application, "num").text = values["num"]
+    ET.SubElement(application, "loanSum").text = values["sum"]
+
+    return fl_event
+
+
+def build_event_fl_1_1(date_str, order_num=1):
+    return fl_event_1_1_element(fl_event_1_1_values(date_str, order_num))
+
+
+class EventMix:
+    # Набор событий субъекта: K событий, типы выбираются по весам.
+    # Коды проверяются и типы ищутся в реестре один раз при создании,
+    # дальше на каждое событие только вызов уже найденных функций.
+    def __init__(self, weights=None, per_subject=1, span_days=EVENT_SPAN_DAYS):
+        weights = weights or {"FL_Event_1_1": 1}
+        unknown = [code for code in weights if code not in EVENT_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown event codes: {', '.join(unknown)}")
+        if per_subject < 1:
+            raise ValueError("per_subject must be at least 1")
+        # NaN не проходит ни одно сравнение, поэтому проверка через not
+        if not all(0 <= weight < math.inf for weight in weights.values()):
+            raise ValueError("Event weights must be finite and non-negative")
+        if not sum(weights.values()):
+            raise ValueError("At least one event weight must be positive")
+
+        self.codes = list(weights)
+        self.types = [EVENT_TYPES[code] for code in self.codes]
+        self.cum_weights = list(accumulate(weights.values()))
+        self.per_subject = per_subject
+        self.span_days = span_days
+
+    def pick(self):
+        # Индексы типов событий в self.types для одного субъекта
+        if len(self.types) == 1:
+            return [0] * self.per_subject
+        return fake.random.choices(range(len(self.types)), cum_weights=self.cum_weights,
+                                   k=self.per_subject)
+
+    def event_dates(self, date_str):
+        # Последнее событие - на дату документа, остальные раньше, по возрастанию
+        end = date.fromisoformat(date_str)
+        offsets = sorted((fake.random.randint(1, self.span_days)
+                          for _ in range(self.per_subject - 1)), reverse=True)
+        return [(end - timedelta(days=offset)).isoformat() for offset in offsets] + [date_str]
+
+    def event_values(self, date_str):
+        # [(индекс типа, значения события), ...] с orderNum по порядку.
+        # UID всех событий субъекта берутся одной пачкой
+        dates = self.event_dates(date_str)
+        picks = self.pick()
+        types = self.types
+        return [(i, types[i][0](event_date, order_num, uid))
+                for order_num, (i, event_date, uid)
+                in enumerate(zip(picks, dates, generate_uids(self.per_subject)), 1)]
+
+    def build_events(self, date_str):
+        events = ET.Element("Events")
+        for i, values in self.event_values(date_str):
+            events.append(self.types[i][1](values))
+        return events
+
+
+def parse_event_mix(text):
+    # "FL_Event_1_1=3,FL_Event_X=1" -> {"FL_Event_1_1": 3, "FL_Event_X": 1}
+    weights = {}
+    for item in text.split(","):
+        code, _, weight = item.strip().partition("=")
+        weights[code] = float(weight) if weight else 1
+    return weights
+
+
+DEFAULT_EVENT_MIX = EventMix()
+
+
+# --- Построение XML для события ---
+def build_events(date_str, mix=DEFAULT_EVENT_MIX):
+    return mix.build_events(date_str)
+
+# --- Построение других частей документа ---
+
+def build_title(person, prev_name=None, prev_doc=None):
+    title = ET.Element("Title")
+    fl_group = ET.SubElement(title, "FL_1_4_Group")
+
+    fl_name = ET.SubElement(fl_group, "FL_1_Name")
+    ET.SubElement(fl_name, "lastName").text = person["lastName"]
+    ET.SubElement(fl_name, "firstName").text = person["firstName"]
+    ET.SubElement(fl_name, "middleName").text = person["middleName"]
+
+    fl_doc = ET.SubElement(fl_group, "FL_4_Doc")
+    ET.SubElement(fl_doc, "countryCode").text = person["citizenship"]
+    ET.SubElement(fl_doc, "docCode").text = person["docCode"]
+    ET.SubElement(fl_doc, "docSeries").text = person["docSeries"]
+    ET.SubElement(fl_doc, "docNum").text = person["docNum"]
+    ET.SubElement(fl_doc, "issueDate").text = person["issueDate"]
+    ET.SubElement(fl_doc, "docIssuer").text = person["docIssuer"]
+    ET.SubElement(fl_doc, "deptCode").text = person["deptCode"]
+    ET.SubElement(fl_doc, "foreignerCode").text = person["foreignerCode"]
+
+    fl_2_5_group = ET.SubElement(title, "FL_2_5_Group")
+
+    # --- Случайное предыдущее имя ---
+    if prev_name is None:
+        prev_name = generate_prev_name()
+    fl_2_prev_name = ET.SubElement(fl_2_5_group, "FL_2_PrevName")
+    ET.SubElement(fl_2_prev_name, "prevNameFlag_1")
+    ET.SubElement(fl_2_prev_name, "lastName").text = prev_name["lastName"]
+    ET.SubElement(fl_2_prev_name, "firstName").text = prev_name["firstName"]
+    ET.SubElement(fl_2_prev_name, "middleName").text = prev_name["middleName"]
+    ET.SubElement(fl_2_prev_name, "date").text = prev_name["date"]
+
+    # --- Случайный предыдущий документ ---
+    if prev_doc is None:
+        prev_doc = generate_prev_doc()
+    fl_5_prev_doc = ET.SubElement(fl_2_5_group, "FL_5_PrevDoc")
+    ET.SubElement(fl_5_prev_doc, "prevDocFact_1")
+    ET.SubElement(fl_5_prev_doc, "countryCode").text = prev_doc["countryCode"]
+    ET.SubElement(fl_5_prev_doc, "docCode").text = prev_doc["docCode"]
+    ET.SubElement(fl_5_prev_doc, "docSeries").text = prev_doc["docSeries"]
+    ET.SubElement(fl_5_prev_doc, "docNum").text = prev_doc["docNum"]
+    ET.SubElement(fl_5_prev_doc, "issueDate").text = prev_doc["issueDate"]
+    ET.SubElement(fl_5_prev_doc, "docIssuer").text = prev_doc["docIssuer"]
+    ET.SubElement(fl_5_prev_doc, "deptCode").text = prev_doc["deptCode"]
+    ET.SubElement(fl_5_prev_doc, "endDate").text = prev_doc["endDate"]
+
+    fl_birth = ET.SubElement(title, "FL_3_Birth")
+    ET.SubElement(fl_birth, "birthDate").text = person["birthDate"]
+    ET.SubElement(fl_birth, "countryCode").text = "999"
+    ET.SubElement(fl_birth, "birthPlace").text = person["birthPlace"]
+
+    fl_tax = ET.SubElement(title, "FL_6_Tax")
+    tax_group = ET.SubElement(fl_tax, "TaxNum_group_FL_6_Tax")
+    ET.SubElement(tax_group, "taxCode").text = "1"
+    ET.SubElement(tax_group, "taxNum").text = person["taxNum"]
+    ET.SubElement(tax_group, "innChecked_0")
+    ET.SubElement(fl_tax, "regNum").text = "_"
+    ET.SubElement(fl_tax, "specialMode_0")
+
+    fl_social = ET.SubElement(title, "FL_7_Social")
+    ET.SubElement(fl_social, "socialNum").text = person["snils"]
+
+    return title
+
+
+def build_subject_fl(person):
+    subject = ET.Element("Subject_FL")
+    title = build_title(person)
+    subject.append(title)
+    return subject
+
+def build_subject_entry(person, date_str, mix=DEFAULT_EVENT_MIX):
+    subject_fl = build_subject_fl(person)
+
+    # Вставляем <Events> с событиями по набору mix
+    events = build_events(date_str, mix)
+    subject_fl.append(events)
+    return subject_fl
+
+def build_data(person, date_str, mix=DEFAULT_EVENT_MIX):
+    data = ET.Element("Data")
+    data.append(build_subject_entry(person, date_str, mix))
+    return data
+
+def build_source(date_str):
+    source = ET.Element("Source")
+    fl_46_org_source = ET.SubElement(source, "FL_46_UL_36_OrgSource")
+    ET.SubElement(fl_46_org_source, "sourceCode").text = "1"
+    ET.SubElement(fl_46_org_source, "sourceRegistrationFact_0")
+    ET.SubElement(fl_46_org_source, "fullName").text = "ООО Тестовая передача"
+    ET.SubElement(fl_46_org_source, "shortName").text = "ООО Тестовая передача"
+    ET.SubElement(fl_46_org_source, "otherName").text = "ООО Тестовая передача"
+    ET.SubElement(fl_46_org_source, "sourceDateStart").text = "2020-01-01"
+    ET.SubElement(fl_46_org_source, "regNum").text = "1"
+
+    tax_num_group = ET.SubElement(fl_46_org_source, "TaxNum_group_FL_46_UL_36_OrgSource")
+    ET.SubElement(tax_num_group, "taxCode").text = "1"
+    ET.SubElement(tax_num_group, "taxNum").text = "1"
+
+    ET.SubElement(fl_46_org_source, "sourceCreditInfoDate").text = date_str
+
+    return source
+
+def document_attrs(reg_number, date_str, subjects_count, group_blocks_count):
+    return {
+        "xmlns:xs": "http://www.w3.org/2001/XMLSchema",
+        "schemaVersion": "3.0",
+        "ogrn": "1234567890123",
+        "sourceID": "YP01MM000001",
+        "regNumberDoc": reg_number,
+        "dateDoc": date_str,
+        "inn": "123456789012",
+        "subjectsCount": str(subjects_count),
+        "groupBlocksCount": str(group_blocks_count),
+        "regNumberDocInaccept": reg_number
+    }
+
+def count_group_blocks(data):
+    # Блоком группы считается каждое событие внутри <Events> субъекта
+    return sum(len(events) for events in data.iter("Events"))
+
+def build_document(person, reg_number, date_str, mix=DEFAULT_EVENT_MIX):
+    data = build_data(person, date_str, mix)
+    document = ET.Element("Document", document_attrs(
+        reg_number, date_str, len(data), count_group_blocks(data)))
+
+    document.append(build_source(date_str))
+    document.append(data)
+    return document
+
+def stream_document(writer, reg_number, date_str, subjects=1, mix=DEFAULT_EVENT_MIX,
+                    person=None):
+    # Субъекты пишутся в открытый <Data> по одному: в памяти только текущий
+    # Subject_FL, поэтому расход памяти не зависит от их количества.
+    # Число событий на субъекта задано в mix, так что счетчики известны заранее.
+    # person - уже сгенерированный первый субъект (DocumentBuilder)
+    writer.declaration()
+    writer.start("Document", document_attrs(reg_number, date_str, subjects,
+                                            subjects * mix.per_subject))
+    writer.element(build_source(date_str))
+    writer.start("Data")
+    written = 0
+    for _ in range(subjects):
+        if person is None:
+            person = generate_random_person()
+        writer.element(build_subject_entry(person, date_str, mix))
+        person = None
+        written += 1
+    writer.end("Data")
+    writer.end("Document")
+    writer.close()
+    return written
+
+def prettify(elem, pretty=True):
+    # Атрибуты <Document ...> пишутся в столбик сразу при выводе корня
+    buf = io.StringIO()
+    XmlWriter(buf, pretty=pretty, multiline_root=True).document(elem)
+    return buf.getvalue()
+
+# --- Шаблонный быстрый путь ---
+# Статическая разметка документа компилируется один раз в шаблоны,
+# на каждый документ только подставляются экранированные значения.
+_templates = {}
+
+
+class DocumentTemplates:
+    def __init__(self, pretty=True, codes=("FL_Event_1_1",)):
+        compiler = FragmentCompiler(pretty, multiline_root=True)
+        writer = compiler.writer
+
+        writer.declaration()
+        writer.start("Document", document_attrs(slot("regNumber"), slot("dateDoc"),
+                                                slot("subjectsCount"), slot("groupBlocksCount")))
+        writer.element(build_source(slot("dateDoc")))
+        writer.start("Data")
+        self.head = compiler.cut()
+
+        writer.start("Subject_FL")
+        self.subject_open = compiler.cut()
+        self.title_depth = writer.depth
+        writer.element(build_title(SlotValues(), SlotValues("prevName_"), SlotValues("prevDoc_")))
+        self.title = compiler.cut()
+        writer.start("Events")
+        self.events_open = compiler.cut()
+        self.events_depth = writer.depth
+
+        # Шаблон на каждый тип события в порядке mix.codes,
+        # None - событие из TREE_EVENTS
+        self.events = []
+        for code in codes:
+            if code in TREE_EVENTS:
+                self.events.append(None)
+                continue
+            writer.element(EVENT_TYPES[code][1](SlotValues()))
+            self.events.append(compiler.cut())
+
+        writer.end("Events")
+        writer.end("Subject_FL")
+        self.subject_close = compiler.cut()
+        writer.end("Data")
+        writer.end("Document")
+        self.tail = compiler.cut()
+
+
+def get_templates(pretty, codes):
+    key = (pretty, tuple(codes))
+    templates = _templates.get(key)
+    if templates is None:
+        templates = _templates[key] = DocumentTemplates(pretty, codes)
+    return templates
+
+
+def render_subject(templates, date_str, mix, pretty):
+    person = generate_random_person()
+    prev_name = generate_prev_name()
+    prev_doc = generate_prev_doc()
+
+    parts = [templates.subject_open.text]
+    values = escape_values(person)
+    escape_values(prev_name, "prevName_", values)
+    escape_values(prev_doc, "prevDoc_", values)
+    if all(values.values()):
+        parts.append(templates.title.render(values))
+    else:
+        # Пустое значение в дереве выводится как <tag/>, а в шаблоне было бы
+        # <tag></tag>, поэтому такой Title пишется через ElementTree
+        buf = io.StringIO()
+        fragment_writer(buf, pretty, templates.title_depth).element(
+            build_title(person, prev_name, prev_doc))
+        parts.append(buf.getvalue())
+
+    parts.append(templates.events_open.text)
+    events = templates.events
+    for i, event in mix.event_values(date_str):
+        if events[i] is None:
+            buf = io.StringIO()
+            fragment_writer(buf, pretty, templates.events_depth).element(mix.types[i][1](event))
+            parts.append(buf.getvalue())
+        else:
+            parts.append(events[i].render(escape_values(event)))
+    parts.append(templates.subject_close.text)
+    return "".join(parts)
+
+
+def render_document(out, reg_number, date_str, subjects=1, mix=DEFAULT_EVENT_MIX, pretty=True):
+    templates = get_templates(pretty, mix.codes)
+    out.write(templates.head.render({
+        "regNumber": escape(reg_number),
+        "dateDoc": escape(date_str),
+        "subjectsCount": str(subjects),
+        "groupBlocksCount": str(subjects * mix.per_subject),
+    }))
+    for _ in range(subjects):
+        out.write(render_subject(templates, date_str, mix, pretty))
+    out.write(templates.tail.text)
+    return subjects
+
+
+# --- Метрики ---
+# Функции модуля и методы, время которых попадает в гистограммы --metrics
+METRIC_PHASES = {
+    "generate_random_person": "person",
+    "generate_prev_name": "prev_name",
+    "generate_prev_doc": "prev_doc",
+    "generate_valid_inn": "inn",
+    "generate_valid_snils": "snils",
+    "generate_uid_with_suffix": "uid",
+    "generate_uids": "uid",
+    "build_title": "title",
+    "build_subject_entry": "subject",
+    "render_subject": "subject",
+}
+
+
+def enable_metrics():
+    metrics.instrument(sys.modules[__name__], METRIC_PHASES)
+    metrics.instrument(EventMix, {"event_values": "events"})
+    metrics.instrument(XmlWriter, {"element": "serialize"})
+
+
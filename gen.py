@@ -1,315 +1,366 @@
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from datetime import datetime
+from datetime import date, datetime
 from faker import Faker
-from uuid import uuid4
-import re
-import random
-
-# --- Инициализация ---
-fake = Faker("ru_RU")
-
-
-def validate_uid(uid: str) -> bool:
-    # Проверка UUIDv4 + суффикс из одного символа a-f0-9
-    pattern = re.compile(r'^[a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[89ab][a-f0-9]{3}-[a-f0-9]{12}-[a-f0-9]$')
-    return bool(pattern.match(uid))
-
-
-
-def generate_uid_with_suffix():
-    uid = str(uuid4()).lower()
-    suffix = random.choice('abcdef0123456789')
-    return f"{uid}-{suffix}"
-
-
-
-# --- Валидаторы ИНН и СНИЛС ---
-def validate_inn(inn: str) -> bool:
-    if len(inn) != 12 or not inn.isdigit():
-        return False
-
-    def calc(digits, coeffs):
-        return str(sum(int(d) * c for d, c in zip(digits, coeffs)) % 11 % 10)
-
-    n1 = calc(inn[:10], [7, 2, 4, 10, 3, 5, 9, 4, 6, 8])
-    n2 = calc(inn[:11], [3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8])
-    return inn[10] == n1 and inn[11] == n2
-
-def validate_snils(snils: str) -> bool:
-    if len(snils) != 11 or not snils.isdigit():
-        return False
-
-    num = snils[:9]
-    control = int(snils[9:])
-    s = sum(int(num[i]) * (9 - i) for i in range(9))
-    if s < 100:
-        check = s
-    elif s in (100, 101):
-        check = 0
+import metrics
+import engine
+from engine import (DEFAULT_EVENT_MIX, FAKER_PROVIDERS, EventMix, derive_seed, fake,
+                    parse_event_mix, render_document, seed_streams, stream_document, today,
+                    use_anchor_date, use_pools, use_uids, use_unique)
+from sinks import COMPRESSIONS, SINK_KINDS, open_sink, parse_size
+from uid_factory import UidFactory
+from unique_ids import UniqueIds, UniqueUids
+from value_pools import ValuePools
+from xml_writer import XmlWriter
+import argparse
+import os
+import sys
+import time
+
+# Пакетная генерация файлов и командная строка. Сами документы строит
+# engine.py, здесь - процессы, приемники, метрики и профиль прогона.
+
+
+def enable_metrics():
+    engine.enable_metrics()
+    metrics.instrument(sys.modules[__name__], {"write_document": "document"})
+
+
+# --- Пакетная генерация ---
+BASE_ID = "YP01MM000001"
+
+# Приемник документов текущего процесса, открывается в setup_process
+output = None
+# Профиль воркера при --profile
+profiler = None
+
+
+def unique_strides(subjects, events):
+    # Сколько значений каждого вида уходит на документ: у субъекта ИНН, СНИЛС,
+    # паспорт и прежний паспорт, у каждого события - UID
+    return {"inn": subjects, "snils": subjects, "passport": 2 * subjects,
+            "uid": subjects * events}
+
+
+def unique_setup(count, seed, subjects, events):
+    # Параметры UniqueIds для всех процессов прогона. Ключ перестановки
+    # с зерном воспроизводим, без зерна - случайный, но общий для воркеров.
+    # Конструктор заодно проверяет, хватит ли пространства значений.
+    key = derive_seed(seed, "unique") if seed is not None else int.from_bytes(os.urandom(8), "big")
+    setup = (key, unique_strides(subjects, events), count)
+    UniqueIds(*setup)
+    return setup
+
+
+def setup_process(pool_size=0, pool_refresh_every=0, seed=None, anchor=None, sink=None,
+                  validate_uids=False, instrument=False, profile=None, unique=None):
+    # Вызывается в каждом воркере (и в основном процессе без пула).
+    # После fork все процессы наследуют одно состояние Faker и random,
+    # поэтому каждому воркеру нужно собственное зерно.
+    # profile - путь профиля: процесс профилирует себя в <profile>.<pid>
+    # unique - результат unique_setup для режима --unique
+    global output, profiler
+    if instrument:
+        enable_metrics()
+    if profile:
+        profiler = metrics.Profiler(metrics.worker_profile_path(profile))
+    use_anchor_date(anchor)
+    uids = UidFactory(fake if seed is not None else None, validate=validate_uids)
+    if unique is not None:
+        ids = UniqueIds(*unique)
+        use_unique(ids)
+        uids = UniqueUids(uids, ids)
     else:
-        check = s % 101
-        if check in (100, 101):
-            check = 0
-
-    return check == control
-
-# --- Генерация валидных значений ---
-def generate_valid_inn():
-    while True:
-        inn = str(fake.random_int(100000000000, 999999999999))
-        if validate_inn(inn):
-            return inn
-
-def generate_valid_snils():
-    while True:
-        snils = str(fake.random_int(10000000000, 99999999999)).zfill(11)
-        if validate_snils(snils):
-            return snils
-
-# --- Генерация случайного субъекта ---
-def generate_random_person():
-    name_parts = fake.name().split()
-    while len(name_parts) < 3:
-        name_parts.append("")
-    return {
-        "lastName": name_parts[0].upper(),
-        "firstName": name_parts[1].upper(),
-        "middleName": name_parts[2].upper(),
-        "birthDate": fake.date_of_birth(minimum_age=18, maximum_age=99).strftime('%Y-%m-%d'),
-        "birthPlace": fake.city().upper(),
-        "citizenship": "643",
-        "docCode": "21",
-        "docSeries": str(fake.random_int(1000, 9999)),
-        "docNum": str(fake.random_int(100000, 999999)),
-        "issueDate": fake.date_between(start_date='-15y', end_date='-1y').strftime('%Y-%m-%d'),
-        "docIssuer": fake.company().upper(),
-        "deptCode": f"{fake.random_int(100,999)}-{fake.random_int(100,999)}",
-        "foreignerCode": "1",
-        "taxNum": generate_valid_inn(),
-        "snils": generate_valid_snils()
-    }
-
-def generate_prev_name():
-    name_parts = fake.name().split()
-    while len(name_parts) < 3:
-        name_parts.append("")
-    return {
-        "lastName": name_parts[0].upper(),
-        "firstName": name_parts[1].upper(),
-        "middleName": name_parts[2].upper(),
-        "date": fake.date_between(start_date='-20y', end_date='-10y').strftime('%Y-%m-%d')
-    }
-
-def generate_prev_doc():
-    return {
-        "countryCode": str(fake.random_int(100, 899)),
-        "docCode": "21",
-        "docSeries": str(fake.random_int(1000, 9999)),
-        "docNum": str(fake.random_int(100000, 999999)),
-        "issueDate": fake.date_between(start_date='-15y', end_date='-5y').strftime('%Y-%m-%d'),
-        "docIssuer": fake.company().upper(),
-        "deptCode": f"{fake.random_int(100,999)}-{fake.random_int(100,999)}",
-        "endDate": fake.date_between(start_date='today', end_date='+10y').strftime('%Y-%m-%d')
-    } 
-
-  
-# --- Генерация события FL_Event_1_1 ---
-def build_event_fl_1_1(date_str):
-    fl_event = ET.Element("FL_Event_1_1", {
-        "operationCode": "A",
-        "orderNum": "1",
-        "eventDate": date_str
-    })
-
-    application = ET.SubElement(fl_event, "FL_55_Application")
-    ET.SubElement(application, "role").text = "1"
-    ET.SubElement(application, "sum").text = f"{fake.random_int(100000, 1000000):.2f}"
-    ET.SubElement(application, "currency").text = "RUB"
-
-    # Генерация UID с проверкой
-    uid = generate_uid_with_suffix()
-    if not validate_uid(uid):
-        raise ValueError(f"Generated UID is invalid: {uid}")
-    ET.SubElement(application, "uid").text = uid
-
-
-
-    application_date = fake.date_between(start_date='-30d', end_date='today').strftime('%Y-%m-%d')
-    ET.SubElement(application, "applicationDate").text = application_date
-    ET.SubElement(application, "sourceCode").text = "1"
-    ET.SubElement(application, "wayCode").text = "6"
-    ET.SubElement(application, "stageEndDate").text = application_date
-    ET.SubElement(application, "purposeCode").text = "2"
-    ET.SubElement(application, "stageCode").text = "1"
-    ET.SubElement(application, "stageDate").text = application_date
-    ET.SubElement(application, "applicationCode").text = "6"
-    ET.SubElement(application, "num").text = application_date.replace("-", "") + f"-{fake.random_int(10000,99999)}"
-    ET.SubElement(application, "loanSum").text = application.find("sum").text
-
-    return fl_event
-
-
-# --- Построение XML для события ---
-def build_events(date_str):
-    events = ET.Element("Events")
-    events.append(build_event_fl_1_1(date_str))
-    return events
-
-# --- Построение других частей документа ---
-
-def build_title(person):
-    title = ET.Element("Title")
-    fl_group = ET.SubElement(title, "FL_1_4_Group")
-
-    fl_name = ET.SubElement(fl_group, "FL_1_Name")
-    ET.SubElement(fl_name, "lastName").text = person["lastName"]
-    ET.SubElement(fl_name, "firstName").text = person["firstName"]
-    ET.SubElement(fl_name, "middleName").text = person["middleName"]
-
-    fl_doc = ET.SubElement(fl_group, "FL_4_Doc")
-    ET.SubElement(fl_doc, "countryCode").text = person["citizenship"]
-    ET.SubElement(fl_doc, "docCode").text = person["docCode"]
-    ET.SubElement(fl_doc, "docSeries").text = person["docSeries"]
-    ET.SubElement(fl_doc, "docNum").text = person["docNum"]
-    ET.SubElement(fl_doc, "issueDate").text = person["issueDate"]
-    ET.SubElement(fl_doc, "docIssuer").text = person["docIssuer"]
-    ET.SubElement(fl_doc, "deptCode").text = person["deptCode"]
-    ET.SubElement(fl_doc, "foreignerCode").text = person["foreignerCode"]
-
-    fl_2_5_group = ET.SubElement(title, "FL_2_5_Group")
-
-    # --- Случайное предыдущее имя ---
-    prev_name = generate_prev_name()
-    fl_2_prev_name = ET.SubElement(fl_2_5_group, "FL_2_PrevName")
-    ET.SubElement(fl_2_prev_name, "prevNameFlag_1")
-    ET.SubElement(fl_2_prev_name, "lastName").text = prev_name["lastName"]
-    ET.SubElement(fl_2_prev_name, "firstName").text = prev_name["firstName"]
-    ET.SubElement(fl_2_prev_name, "middleName").text = prev_name["middleName"]
-    ET.SubElement(fl_2_prev_name, "date").text = prev_name["date"]
-
-    # --- Случайный предыдущий документ ---
-    prev_doc = generate_prev_doc()
-    fl_5_prev_doc = ET.SubElement(fl_2_5_group, "FL_5_PrevDoc")
-    ET.SubElement(fl_5_prev_doc, "prevDocFact_1")
-    ET.SubElement(fl_5_prev_doc, "countryCode").text = prev_doc["countryCode"]
-    ET.SubElement(fl_5_prev_doc, "docCode").text = prev_doc["docCode"]
-    ET.SubElement(fl_5_prev_doc, "docSeries").text = prev_doc["docSeries"]
-    ET.SubElement(fl_5_prev_doc, "docNum").text = prev_doc["docNum"]
-    ET.SubElement(fl_5_prev_doc, "issueDate").text = prev_doc["issueDate"]
-    ET.SubElement(fl_5_prev_doc, "docIssuer").text = prev_doc["docIssuer"]
-    ET.SubElement(fl_5_prev_doc, "deptCode").text = prev_doc["deptCode"]
-    ET.SubElement(fl_5_prev_doc, "endDate").text = prev_doc["endDate"]
-
-    fl_birth = ET.SubElement(title, "FL_3_Birth")
-    ET.SubElement(fl_birth, "birthDate").text = person["birthDate"]
-    ET.SubElement(fl_birth, "countryCode").text = "999"
-    ET.SubElement(fl_birth, "birthPlace").text = person["birthPlace"]
-
-    fl_tax = ET.SubElement(title, "FL_6_Tax")
-    tax_group = ET.SubElement(fl_tax, "TaxNum_group_FL_6_Tax")
-    ET.SubElement(tax_group, "taxCode").text = "1"
-    ET.SubElement(tax_group, "taxNum").text = person["taxNum"]
-    ET.SubElement(tax_group, "innChecked_0")
-    ET.SubElement(fl_tax, "regNum").text = "_"
-    ET.SubElement(fl_tax, "specialMode_0")
-
-    fl_social = ET.SubElement(title, "FL_7_Social")
-    ET.SubElement(fl_social, "socialNum").text = person["snils"]
-
-    return title
-
-
-def build_subject_fl(person):
-    subject = ET.Element("Subject_FL")
-    title = build_title(person)
-    subject.append(title)
-    return subject
-
-def build_data(person, date_str):
-    data = ET.Element("Data")
-    subject_fl = build_subject_fl(person)
-    
-    # Вставляем <Events> с <FL_Event_1_1>
-    events = build_events(date_str)
-    subject_fl.append(events)
-
-    data.append(subject_fl)
-    return data
-
-def build_source(date_str):
-    source = ET.Element("Source")
-    fl_46_org_source = ET.SubElement(source, "FL_46_UL_36_OrgSource")
-    ET.SubElement(fl_46_org_source, "sourceCode").text = "1"
-    ET.SubElement(fl_46_org_source, "sourceRegistrationFact_0")
-    ET.SubElement(fl_46_org_source, "fullName").text = "ООО Тестовая передача"
-    ET.SubElement(fl_46_org_source, "shortName").text = "ООО Тестовая передача"
-    ET.SubElement(fl_46_org_source, "otherName").text = "ООО Тестовая передача"
-    ET.SubElement(fl_46_org_source, "sourceDateStart").text = "2020-01-01"
-    ET.SubElement(fl_46_org_source, "regNum").text = "1"
-
-    tax_num_group = ET.SubElement(fl_46_org_source, "TaxNum_group_FL_46_UL_36_OrgSource")
-    ET.SubElement(tax_num_group, "taxCode").text = "1"
-    ET.SubElement(tax_num_group, "taxNum").text = "1"
-
-    ET.SubElement(fl_46_org_source, "sourceCreditInfoDate").text = date_str
-
-    return source
-
-def build_document(person, reg_number, date_str):
-    document = ET.Element("Document", {
-        "xmlns:xs": "http://www.w3.org/2001/XMLSchema",
-        "schemaVersion": "3.0",
-        "ogrn": "1234567890123",
-        "sourceID": "YP01MM000001",
-        "regNumberDoc": reg_number,
-        "dateDoc": date_str,
-        "inn": "123456789012",
-        "subjectsCount": "1",
-        "groupBlocksCount": "1",
-        "regNumberDocInaccept": reg_number
-    })
-
-    document.append(build_source(date_str))
-    document.append(build_data(person, date_str))
-    return document
-
-def prettify(elem):
-    rough_string = ET.tostring(elem, encoding="utf-8")
-    reparsed = minidom.parseString(rough_string)
-    xml_string = reparsed.toprettyxml(indent="    ", encoding="utf-8").decode("utf-8")
-
-    # Перенос атрибутов <Document ...> в столбик
-    lines = xml_string.splitlines()
-    new_lines = []
-    for line in lines:
-        if line.startswith("<Document "):
-            parts = line.replace("<Document ", "").rstrip(">").split('" ')
-            new_lines.append("<Document")
-            for part in parts:
-                if part:
-                    if not part.endswith('"'):
-                        part += '"'
-                    new_lines.append("    " + part.strip())
-            new_lines[-1] += ">"
+        use_unique(None)
+    use_uids(uids)
+    output = open_sink(**(sink or {}))
+    seed_streams(int.from_bytes(os.urandom(8), "big"))
+
+    # Пулы строятся заново в каждом воркере
+    use_pools(build_pools(pool_size, pool_refresh_every, seed) if pool_size else None)
+
+
+def build_pools(pool_size, pool_refresh_every=0, seed=None):
+    # При заданном зерне пулы заполняются из отдельного потока, одинакового
+    # во всех процессах; даты отсчитываются от today(), поэтому дата отсчета
+    # задается до вызова
+    source = fake
+    if seed is not None:
+        source = Faker("ru_RU", providers=FAKER_PROVIDERS)
+        source.seed_instance(derive_seed(seed, "pools"))
+    return ValuePools(fake, pool_size, pool_refresh_every, today=today(), source=source)
+
+
+def init_worker(*setup):
+    # multiprocessing импортируется только для пакетной генерации: на запуск
+    # с одним документом он не нужен
+    from multiprocessing.util import Finalize
+
+    setup_process(*setup)
+    # У каждого воркера свои части архивов; он дописывает и закрывает
+    # их при штатном завершении (pool.close + join, не terminate)
+    Finalize(None, output.close, exitpriority=10)
+    if profiler is not None:
+        Finalize(None, profiler.save, exitpriority=5)
+
+
+def write_document(reg_number, date_str, sink, pretty=True, subjects=1,
+                   mix=DEFAULT_EVENT_MIX, template=False, validate=False, render=None):
+    # render(out, reg_number, date_str, subjects, mix, pretty) - свой способ
+    # записи документа вместо потокового и шаблонного (page object)
+    with sink.document(f"{reg_number}.xml") as f:
+        if metrics.enabled:
+            f = timer = metrics.TimedWriter(f)
+        if validate:
+            # Проверка идет по тому же тексту, что уходит в приемник, без
+            # повторного чтения; модуль нужен только с --validate
+            from validator import DocumentValidator, InvalidDocument, ValidatingWriter
+
+            f = ValidatingWriter(f, DocumentValidator())
+        if render is not None:
+            render(f, reg_number, date_str, subjects, mix, pretty)
+        elif template:
+            render_document(f, reg_number, date_str, subjects, mix, pretty)
+        else:
+            writer = XmlWriter(f, pretty=pretty, multiline_root=True)
+            stream_document(writer, reg_number, date_str, subjects, mix)
+        if validate:
+            errors = f.close()
+            if errors:
+                raise InvalidDocument(f"{reg_number}.xml", errors)
+    if metrics.enabled:
+        timer.finish()
+        metrics.registry.inc("documents")
+        metrics.registry.inc("subjects", subjects)
+    return sink.location
+
+
+def write_chunk(task):
+    prefix, start, stop, width, date_str, seed, options = task
+    for i in range(start, stop):
+        if seed is not None:
+            seed_streams(derive_seed(seed, i))
+        if engine.unique is not None:
+            engine.unique.document(i)
+        write_document(f"{prefix}_{i:0{width}d}", date_str, output, **options)
+    # Метрики воркера уходят родителю вместе со счетчиком документов
+    return stop - start, metrics.registry.drain() if metrics.enabled else None
+
+
+def shard_range(count, shard_index=0, shard_count=1):
+    # Документы делятся на шарды сплошными диапазонами номеров
+    return range(count * shard_index // shard_count, count * (shard_index + 1) // shard_count)
+
+
+def run_prefix(date_str, seed=None, run_id=None):
+    # Без зерна имя прогона - время запуска, с зерном - дата и зерно,
+    # чтобы все шарды и повторные запуски давали одни и те же имена
+    if run_id is None:
+        if seed is None:
+            run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
         else:
-            new_lines.append(line)
-    return "\n".join(new_lines)
+            run_id = f"{date_str.replace('-', '')}_s{seed}"
+    return f"{BASE_ID}_{run_id}"
+
+
+def generate_batch(count, workers=1, chunk_size=100, shard=(0, 1), seed=None, date_str=None,
+                   run_id=None, pool_size=0, pool_refresh_every=0, sink=None,
+                   validate_uids=False, instrument=False, profile=None, unique=False,
+                   **options):
+    # sink - параметры open_sink, options передаются в write_document:
+    # pretty, subjects, mix, template, validate, render. instrument - собирать метрики
+    # фаз в metrics.registry, profile - путь для профилей воркеров,
+    # unique - ИНН, СНИЛС, паспорта и UID без повторов во всем прогоне
+    anchor = date.fromisoformat(date_str) if date_str else None
+    date_for_doc = date_str or date.today().isoformat()
+    prefix = run_prefix(date_for_doc, seed, run_id)
+    width = len(str(count - 1))
+    indices = shard_range(count, *shard)
+
+    # Воркеры пишут файлы сами, в родительский процесс возвращается только счетчик
+    tasks = (
+        (prefix, start, min(start + chunk_size, indices.stop), width, date_for_doc, seed, options)
+        for start in range(indices.start, indices.stop, chunk_size)
+    )
+    setup = (pool_size, pool_refresh_every, seed, anchor, sink, validate_uids, instrument)
+    if unique:
+        # Диапазоны считаются от номера документа во всем прогоне, поэтому
+        # шарды и воркеры не пересекаются без общего состояния
+        unique = unique_setup(count, seed, options.get("subjects", 1),
+                              options.get("mix", DEFAULT_EVENT_MIX).per_subject)
+    else:
+        unique = None
 
-# --- Основной запуск ---
-if __name__ == "__main__":
-    now = datetime.now()
-    date_for_doc = now.strftime('%Y-%m-%d')
-    timestamp = now.strftime('%Y%m%d_%H%M%S')
+    started = time.perf_counter()
+    if workers == 1:
+        setup_process(*setup, unique=unique)
+        done = collect_chunks(map(write_chunk, tasks))
+        output.close()
+    else:
+        from multiprocessing import Pool
+
+        pool = Pool(workers, initializer=init_worker, initargs=setup + (profile, unique))
+        try:
+            done = collect_chunks(pool.imap_unordered(write_chunk, tasks))
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    elapsed = time.perf_counter() - started
+    return done, elapsed
+
+
+def collect_chunks(results):
+    done = 0
+    for count, snapshot in results:
+        done += count
+        if snapshot is not None:
+            metrics.registry.merge(snapshot)
+    return done
+
+
+def parse_shard(text):
+    # "k/N": шард k (с нуля) из N
+    index, _, total = text.partition("/")
+    index, total = int(index), int(total)
+    if not 0 <= index < total:
+        raise argparse.ArgumentTypeError("shard must be k/N with 0 <= k < N")
+    return index, total
+
+
+def parse_args(description="Генерация файлов событий", template=True):
+    # template=False - без --template, для генераторов со своим render
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--count", type=int, default=1, help="количество документов")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="количество процессов (0 - по числу ядер)")
+    parser.add_argument("--out-dir", default=".", help="каталог для файлов")
+    parser.add_argument("--chunk-size", type=int, default=100,
+                        help="документов на одну задачу воркера")
+    parser.add_argument("--compact", action="store_true",
+                        help="писать XML без отступов и переводов строк")
+    parser.add_argument("--subjects", type=int, default=1,
+                        help="количество субъектов Subject_FL в одном документе")
+    parser.add_argument("--events", type=int, default=1,
+                        help="количество событий на одного субъекта")
+    parser.add_argument("--event-mix", default="FL_Event_1_1",
+                        help="коды событий с весами через запятую, например FL_Event_1_1=1")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="размер пулов имен, городов, организаций и дат (0 - без пулов)")
+    parser.add_argument("--pool-refresh-every", type=int, default=0,
+                        help="обновлять 10%% пула каждые N выборок (0 - не обновлять)")
+    if template:
+        parser.add_argument("--template", action="store_true",
+                            help="быстрый путь: заранее скомпилированный шаблон документа")
+    else:
+        parser.set_defaults(template=False)
+    parser.add_argument("--seed", type=int,
+                        help="зерно: одинаковый результат при любом числе воркеров и шардов")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1),
+                        help="сгенерировать только шард k/N (k с нуля) из --count документов")
+    parser.add_argument("--date", help="дата документа и отсчета дат, YYYY-MM-DD (по умолчанию сегодня)")
+    parser.add_argument("--run-id", help="часть имени файлов после sourceID (по умолчанию время запуска)")
+    parser.add_argument("--sink", choices=SINK_KINDS, default="dir",
+                        help="куда писать: dir - файл на документ, concat - документы подряд "
+                             "через перевод строки, zip/tar - архивы")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none",
+                        help="сжатие для concat и tar (zstd требует пакет zstandard)")
+    parser.add_argument("--compression-level", type=int, help="уровень сжатия")
+    parser.add_argument("--rotate-docs", type=int, default=0,
+                        help="новая часть после N документов (0 - без ограничения)")
+    parser.add_argument("--rotate-size", type=parse_size, default=0,
+                        help="новая часть после такого размера на диске, например 512M")
+    parser.add_argument("--validate-uids", action="store_true",
+                        help="проверять формат каждого сгенерированного UID")
+    parser.add_argument("--validate", action="store_true",
+                        help="проверять структуру и контрольные суммы каждого документа "
+                             "при записи; первая ошибка останавливает генерацию")
+    parser.add_argument("--metrics",
+                        help="сохранить счетчики и время фаз: .prom - текст Prometheus, "
+                             "иначе JSON; при SIGUSR1 файл обновляется на ходу")
+    parser.add_argument("--profile", help="сохранить профиль cProfile (pstats) в файл")
+    parser.add_argument("--unique", action="store_true",
+                        help="ИНН, СНИЛС, паспорта и UID без повторов во всем прогоне, "
+                             "включая все воркеры и шарды")
+    args = parser.parse_args()
+    if args.subjects < 1:
+        parser.error("--subjects must be at least 1")
+    if args.events < 1:
+        parser.error("--events must be at least 1")
+    try:
+        # Коды и веса проверяются до запуска: ошибка - сообщение парсера, а не трассировка
+        args.mix = EventMix(parse_event_mix(args.event_mix), args.events)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.seed is not None and args.pool_refresh_every:
+        # Обновление пула зависит от того, сколько выборок сделал конкретный процесс
+        parser.error("--pool-refresh-every cannot be combined with --seed")
+    if args.unique:
+        try:
+            UniqueIds(0, unique_strides(args.subjects, args.events), args.count)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
 
-    base_id = "YP01MM000001"
-    reg_number = f"{base_id}_{timestamp}"
 
-    person_data = generate_random_person()
-    document_xml = build_document(person_data, reg_number, date_for_doc)
+# --- Основной запуск ---
+def main(args, render=None):
+    # render - см. write_document; xml_generator.py передает сюда page object
+    main_profiler = metrics.Profiler(args.profile) if args.profile else None
+    if args.metrics:
+        import signal
+
+        # Снимок метрик по запросу: kill -USR1 <pid> (в Windows сигнала нет)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: metrics.registry.save(args.metrics))
+    options = {"pretty": not args.compact, "subjects": args.subjects,
+               "mix": args.mix, "template": args.template, "validate": args.validate,
+               "render": render}
+    sink = {"kind": args.sink, "out_dir": args.out_dir, "compression": args.compression,
+            "level": args.compression_level, "max_docs": args.rotate_docs,
+            "max_bytes": args.rotate_size}
+
+    # Один документ без шардов пишется без пула; с --shard он достается
+    # одному из шардов, как в пакетном режиме
+    if args.count == 1 and args.shard == (0, 1):
+        anchor = date.fromisoformat(args.date) if args.date else None
+        unique = unique_setup(1, args.seed, args.subjects, args.events) if args.unique else None
+        setup_process(args.pool_size, args.pool_refresh_every, args.seed, anchor, sink,
+                      args.validate_uids, bool(args.metrics), unique=unique)
+        date_for_doc = today().isoformat()
+        if args.seed is not None:
+            seed_streams(derive_seed(args.seed, 0))
+        if args.unique:
+            engine.unique.document(0)
+        reg_number = run_prefix(date_for_doc, args.seed, args.run_id)
+
+        file_name = write_document(reg_number, date_for_doc, output, **options)
+        output.close()
+        print(f"Документ сохранен в файл: {file_name}")
+    else:
+        workers = args.workers or os.cpu_count()
+        done, elapsed = generate_batch(args.count, workers, args.chunk_size, args.shard,
+                                       args.seed, args.date, args.run_id,
+                                       args.pool_size, args.pool_refresh_every, sink,
+                                       args.validate_uids, bool(args.metrics), args.profile,
+                                       args.unique, **options)
+        print(f"Сгенерировано документов: {done} за {elapsed:.2f} с "
+              f"({done / elapsed:.1f} док/с, процессов: {workers})")
+
+    if args.metrics:
+        metrics.registry.save(args.metrics)
+        print(f"Метрики сохранены в файл: {args.metrics}")
+    if main_profiler is not None:
+        main_profiler.save()
+        metrics.merge_profiles(args.profile)
+        print(f"Профиль сохранен в файл: {args.profile}")
 
-    file_name = f"{reg_number}.xml"
-    with open(file_name, "w", encoding="utf-8") as f:
-        f.write(prettify(document_xml))
 
-    print(f"Документ сохранен в файл: {file_name}")
+if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        # freeze_support нужен только собранному exe; импорт multiprocessing
+        # стоит ~11 мс запуска, а пул все равно импортирует его сам
+        from multiprocessing import freeze_support
+
+        freeze_support()
+    main(parse_args())
@@ -0,0 +1,191 @@
+from bisect import bisect_left
+import glob
+import json
+import os
+import time
+
+# Необязательные метрики генерации: счетчики и гистограммы времени по фазам
+# (субъект, ИНН, СНИЛС, Title, события, сериализация, запись).
+#   python gen.py --count 1000 --metrics run.json        JSON
+#   python gen.py --count 1000 --metrics run.prom        текст Prometheus
+#   python gen.py --count 1000 --profile run.prof        cProfile (snakeviz, flameprof)
+# Пока instrument() не вызван, функции генератора вызываются напрямую,
+# поэтому выключенные метрики ничего не стоят. instrument() подменяет
+# функции модуля или методы класса обертками с замером времени.
+# Фазы вложены: person включает inn и snils, serialize - запись в приемник.
+
+# Верхние границы корзин гистограммы, секунды
+BUCKETS = (0.00001, 0.00003, 0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0)
+PREFIX = "events_gen"
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, phase, seconds):
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = Histogram()
+        histogram.observe(seconds)
+
+    def snapshot(self):
+        return {
+            "counters": dict(self.counters),
+            "phases": {phase: {"count": h.count, "sum": h.sum, "buckets": list(h.counts)}
+                       for phase, h in self.histograms.items()},
+        }
+
+    def drain(self):
+        # Снимок с обнулением: воркер отдает накопленное родителю по частям
+        snapshot = self.snapshot()
+        self.counters.clear()
+        self.histograms.clear()
+        return snapshot
+
+    def merge(self, snapshot):
+        for name, value in snapshot["counters"].items():
+            self.inc(name, value)
+        for phase, data in snapshot["phases"].items():
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = Histogram()
+            histogram.count += data["count"]
+            histogram.sum += data["sum"]
+            histogram.counts = [a + b for a, b in zip(histogram.counts, data["buckets"])]
+
+    def to_json(self):
+        phases = {}
+        for phase, h in sorted(self.histograms.items()):
+            phases[phase] = {
+                "count": h.count,
+                "total_sec": round(h.sum, 6),
+                "mean_ms": round(h.sum / h.count * 1000, 4) if h.count else 0,
+                "buckets": {label: n for label, n in zip(bucket_labels(), h.counts)},
+            }
+        return json.dumps({"counters": dict(sorted(self.counters.items())), "phases": phases},
+                          ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {PREFIX}_{name}_total counter", f"{PREFIX}_{name}_total {value}"]
+        if self.histograms:
+            lines.append(f"# TYPE {PREFIX}_phase_seconds histogram")
+        for phase, h in sorted(self.histograms.items()):
+            cumulative = 0
+            for label, n in zip(bucket_labels(), h.counts):
+                cumulative += n
+                lines.append(f'{PREFIX}_phase_seconds_bucket{{phase="{phase}",le="{label}"}} '
+                             f'{cumulative}')
+            lines.append(f'{PREFIX}_phase_seconds_sum{{phase="{phase}"}} {h.sum:.6f}')
+            lines.append(f'{PREFIX}_phase_seconds_count{{phase="{phase}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def save(self, path):
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def bucket_labels():
+    return [repr(b) for b in BUCKETS] + ["+Inf"]
+
+
+# Метрики текущего процесса
+registry = Metrics()
+enabled = False
+
+
+def timed(func, phase):
+    observe = registry.observe
+    perf_counter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        started = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe(phase, perf_counter() - started)
+
+    wrapper.__name__ = func.__name__
+    wrapper.__qualname__ = func.__qualname__
+    wrapper.__wrapped__ = func
+    wrapper.phase = phase
+    return wrapper
+
+
+def instrument(target, phases):
+    # target - модуль или класс, phases - {имя функции или метода: фаза}.
+    # Повторный вызов для того же target ничего не меняет.
+    global enabled
+    enabled = True
+    for name, phase in phases.items():
+        func = getattr(target, name)
+        if getattr(func, "phase", None) is None:
+            setattr(target, name, timed(func, phase))
+
+
+class TimedWriter:
+    # Поток вывода с замером времени записи в приемник за документ
+    def __init__(self, out):
+        self.out = out
+        self.spent = 0.0
+
+    def write(self, text):
+        started = time.perf_counter()
+        self.out.write(text)
+        self.spent += time.perf_counter() - started
+
+    def finish(self):
+        registry.observe("write", self.spent)
+
+
+# --- Профилирование ---
+class Profiler:
+    # cProfile с момента создания до save()
+    def __init__(self, path):
+        import cProfile
+
+        self.path = path
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def save(self):
+        self.profile.disable()
+        self.profile.dump_stats(self.path)
+
+
+def worker_profile_path(path):
+    return f"{path}.{os.getpid()}"
+
+
+def merge_profiles(path):
+    # Профили воркеров (path.<pid>) сливаются с профилем основного процесса
+    import pstats
+
+    parts = sorted(glob.glob(glob.escape(path) + ".[0-9]*"))
+    if not parts:
+        return
+    stats = pstats.Stats(*([path] if os.path.exists(path) else []) + parts)
+    stats.dump_stats(path)
+    for part in parts:
+        os.remove(part)
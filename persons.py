@@ -0,0 +1,138 @@
+from array import array
+from datetime import date
+
+# Компактное представление субъектов.
+# Person - запись на __slots__ вместо словаря из 15 ключей: постоянные поля
+# (гражданство, код документа, признак иностранца) живут в классе, а не
+# в каждой записи. Читается как словарь (person["lastName"], items()),
+# поэтому build_title, шаблоны и COPY работают с ней без изменений.
+# PersonBatch - столбцы array на миллионы субъектов: даты хранятся днями,
+# номера документов, ИНН и СНИЛС - числами, повторяющиеся строки (ФИО,
+# города, организации) - индексами в общем словаре строк. Запись Person
+# собирается из столбцов только при обращении к субъекту.
+
+PERSON_FIELDS = (
+    "lastName", "firstName", "middleName", "birthDate", "birthPlace", "citizenship",
+    "docCode", "docSeries", "docNum", "issueDate", "docIssuer", "deptCode",
+    "foreignerCode", "taxNum", "snils",
+)
+
+
+class Person:
+    __slots__ = ("lastName", "firstName", "middleName", "birthDate", "birthPlace",
+                 "docSeries", "docNum", "issueDate", "docIssuer", "deptCode", "taxNum", "snils")
+
+    citizenship = "643"
+    # Так же поле называется в генераторе page object
+    countryCode = "643"
+    docCode = "21"
+    foreignerCode = "1"
+
+    def __init__(self, last_name, first_name, middle_name, birth_date, birth_place,
+                 doc_series, doc_num, issue_date, doc_issuer, dept_code, tax_num, snils):
+        self.lastName = last_name
+        self.firstName = first_name
+        self.middleName = middle_name
+        self.birthDate = birth_date
+        self.birthPlace = birth_place
+        self.docSeries = doc_series
+        self.docNum = doc_num
+        self.issueDate = issue_date
+        self.docIssuer = doc_issuer
+        self.deptCode = dept_code
+        self.taxNum = tax_num
+        self.snils = snils
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return PERSON_FIELDS
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in PERSON_FIELDS]
+
+    def __eq__(self, other):
+        return isinstance(other, Person) and self.items() == other.items()
+
+    def __repr__(self):
+        return f"Person({dict(self.items())})"
+
+
+class StringColumn:
+    # Строки столбца хранятся один раз, в записи - только индекс
+    def __init__(self, strings):
+        self.strings = strings
+        self.codes = array("I")
+
+    def append(self, value):
+        code = self.strings.index.get(value)
+        if code is None:
+            code = self.strings.index[value] = len(self.strings.values)
+            self.strings.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, i):
+        return self.strings.values[self.codes[i]]
+
+
+class StringTable:
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+
+class PersonBatch:
+    def __init__(self):
+        self.strings = StringTable()
+        self.last_name = StringColumn(self.strings)
+        self.first_name = StringColumn(self.strings)
+        self.middle_name = StringColumn(self.strings)
+        self.birth_place = StringColumn(self.strings)
+        self.doc_issuer = StringColumn(self.strings)
+        self.birth_date = array("i")
+        self.issue_date = array("i")
+        self.doc_series = array("H")
+        self.doc_num = array("I")
+        self.dept_code = array("I")
+        self.tax_num = array("q")
+        self.snils = array("q")
+
+    def append(self, person):
+        self.last_name.append(person["lastName"])
+        self.first_name.append(person["firstName"])
+        self.middle_name.append(person["middleName"])
+        self.birth_place.append(person["birthPlace"])
+        self.doc_issuer.append(person["docIssuer"])
+        self.birth_date.append(date.fromisoformat(person["birthDate"]).toordinal())
+        self.issue_date.append(date.fromisoformat(person["issueDate"]).toordinal())
+        self.doc_series.append(int(person["docSeries"]))
+        self.doc_num.append(int(person["docNum"]))
+        # "123-456" -> 123456
+        self.dept_code.append(int(person["deptCode"].replace("-", "")))
+        self.tax_num.append(int(person["taxNum"]))
+        self.snils.append(int(person["snils"]))
+
+    def __len__(self):
+        return len(self.birth_date)
+
+    def __getitem__(self, i):
+        dept = self.dept_code[i]
+        return Person(
+            self.last_name[i], self.first_name[i], self.middle_name[i],
+            date.fromordinal(self.birth_date[i]).isoformat(), self.birth_place[i],
+            str(self.doc_series[i]), str(self.doc_num[i]),
+            date.fromordinal(self.issue_date[i]).isoformat(), self.doc_issuer[i],
+            f"{dept // 1000:03d}-{dept % 1000:03d}", f"{self.tax_num[i]:012d}",
+            f"{self.snils[i]:011d}",
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,235 @@
+from datetime import date
+from multiprocessing import Pool, freeze_support
+from queue import Queue
+from threading import Lock, Thread
+import argparse
+import io
+import os
+import time
+
+from psycopg2.pool import ThreadedConnectionPool
+
+import engine
+import gen
+
+# Загрузка сгенерированных субъектов и событий прямо в PostgreSQL через
+# COPY FROM STDIN, без промежуточных XML-файлов. Генерация пачек идет в
+# процессах, загрузка - в потоках с пулом соединений, так что пока одна
+# пачка уходит в базу, следующие уже генерируются.
+
+PERSON_COLUMNS = {
+    "lastName": "last_name",
+    "firstName": "first_name",
+    "middleName": "middle_name",
+    "birthDate": "birth_date",
+    "birthPlace": "birth_place",
+    "citizenship": "citizenship",
+    "docCode": "doc_code",
+    "docSeries": "doc_series",
+    "docNum": "doc_num",
+    "issueDate": "issue_date",
+    "docIssuer": "doc_issuer",
+    "deptCode": "dept_code",
+    "foreignerCode": "foreigner_code",
+    "taxNum": "tax_num",
+    "snils": "snils",
+}
+EVENT_COLUMNS = {
+    "orderNum": "order_num",
+    "eventDate": "event_date",
+    "sum": "sum",
+    "uid": "uid",
+    "applicationDate": "application_date",
+    "num": "num",
+}
+
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS persons (
+    id bigint PRIMARY KEY,
+    last_name text NOT NULL,
+    first_name text NOT NULL,
+    middle_name text NOT NULL,
+    birth_date date NOT NULL,
+    birth_place text NOT NULL,
+    citizenship char(3) NOT NULL,
+    doc_code text NOT NULL,
+    doc_series text NOT NULL,
+    doc_num text NOT NULL,
+    issue_date date NOT NULL,
+    doc_issuer text NOT NULL,
+    dept_code text NOT NULL,
+    foreigner_code text NOT NULL,
+    tax_num char(12) NOT NULL,
+    snils char(11) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    person_id bigint NOT NULL,
+    event_code text NOT NULL,
+    order_num integer NOT NULL,
+    event_date date NOT NULL,
+    sum numeric(15, 2) NOT NULL,
+    uid text NOT NULL,
+    application_date date NOT NULL,
+    num text NOT NULL
+);
+"""
+
+COPY_PERSONS = f"COPY persons (id, {', '.join(PERSON_COLUMNS.values())}) FROM STDIN"
+COPY_EVENTS = f"COPY events (person_id, event_code, {', '.join(EVENT_COLUMNS.values())}) FROM STDIN"
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_line(values):
+    # Строка текстового формата COPY: табуляция между полями, \N для NULL
+    return "\t".join("\\N" if v is None else str(v).translate(COPY_ESCAPES) for v in values) + "\n"
+
+
+def format_batch(task):
+    # Выполняется в воркере: генерирует пачку субъектов с событиями
+    # и возвращает готовые тексты для COPY обеих таблиц
+    start_id, size, date_str, mix, seed = task
+    if seed is not None:
+        engine.seed_streams(engine.derive_seed(seed, start_id))
+    persons, events = [], []
+    person_keys = tuple(PERSON_COLUMNS)
+    event_keys = tuple(EVENT_COLUMNS)
+    for person_id in range(start_id, start_id + size):
+        person = engine.generate_random_person()
+        persons.append(copy_line((person_id, *(person[k] for k in person_keys))))
+        for i, values in mix.event_values(date_str):
+            events.append(copy_line((person_id, mix.codes[i], *(values.get(k) for k in event_keys))))
+    return size, len(events), "".join(persons), "".join(events)
+
+
+class CopySink:
+    # Потоки-загрузчики забирают готовые пачки из ограниченной очереди.
+    # Очередь дает обратное давление: генерация ждет, если база не успевает.
+    def __init__(self, dsn, loaders=4, queue_size=8):
+        self.pool = ThreadedConnectionPool(1, loaders, dsn)
+        self.queue = Queue(maxsize=queue_size)
+        self.errors = []
+        self.lock = Lock()
+        self.persons = 0
+        self.events = 0
+        self.threads = [Thread(target=self._load, daemon=True) for _ in range(loaders)]
+        for thread in self.threads:
+            thread.start()
+
+    def create_tables(self):
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(CREATE_TABLES)
+            conn.commit()
+        finally:
+            self.pool.putconn(conn)
+
+    def put(self, batch):
+        if self.errors:
+            raise self.errors[0]
+        self.queue.put(batch)
+
+    def _load(self):
+        # Поток не должен падать: иначе put() и close() повиснут на полной
+        # очереди. После первой ошибки пачки только вычитываются из очереди.
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            if self.errors:
+                continue
+            try:
+                self._copy(batch)
+            except Exception as e:
+                self.errors.append(e)
+
+    def _copy(self, batch):
+        persons, events, persons_text, events_text = batch
+        conn = self.pool.getconn()
+        broken = False
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(COPY_PERSONS, io.StringIO(persons_text))
+                cur.copy_expert(COPY_EVENTS, io.StringIO(events_text))
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                # Соединение потеряно: в пул его не возвращаем
+                broken = True
+            raise
+        finally:
+            self.pool.putconn(conn, close=broken)
+        with self.lock:
+            self.persons += persons
+            self.events += events
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.pool.closeall()
+        if self.errors:
+            raise self.errors[0]
+
+
+def load(dsn, persons, batch_size=10000, workers=1, loaders=4, mix=engine.DEFAULT_EVENT_MIX,
+         start_id=1, create_tables=False, seed=None, date_str=None):
+    # date_str - eventDate и дата отсчета случайных дат, как gen.py --date;
+    # с зерном и датой повторный запуск дает те же строки
+    anchor = date.fromisoformat(date_str) if date_str else None
+    date_str = date_str or date.today().isoformat()
+    # С зерном каждая пачка пересевается от своего первого id
+    tasks = (
+        (start, min(batch_size, start_id + persons - start), date_str, mix, seed)
+        for start in range(start_id, start_id + persons, batch_size)
+    )
+
+    sink = CopySink(dsn, loaders)
+    if create_tables:
+        sink.create_tables()
+
+    started = time.perf_counter()
+    try:
+        if workers == 1:
+            gen.setup_process(0, 0, seed, anchor)
+            for task in tasks:
+                sink.put(format_batch(task))
+        else:
+            # С зерном воркеры берут UID из fake.random, иначе - из os.urandom
+            with Pool(workers, initializer=gen.init_worker,
+                      initargs=(0, 0, seed, anchor)) as pool:
+                for batch in pool.imap(format_batch, tasks):
+                    sink.put(batch)
+    finally:
+        sink.close()
+    return sink.persons, sink.events, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    freeze_support()
+    parser = argparse.ArgumentParser(description="Загрузка сгенерированных данных в PostgreSQL через COPY")
+    parser.add_argument("--dsn", default=os.environ.get("PG_DSN", "dbname=events_gen"),
+                        help="строка подключения libpq (по умолчанию из PG_DSN)")
+    parser.add_argument("--persons", type=int, default=10000, help="количество субъектов")
+    parser.add_argument("--events", type=int, default=1, help="событий на субъекта")
+    parser.add_argument("--batch-size", type=int, default=10000, help="субъектов в одном COPY")
+    parser.add_argument("--workers", type=int, default=1, help="процессов генерации (0 - по числу ядер)")
+    parser.add_argument("--loaders", type=int, default=4, help="потоков загрузки и соединений")
+    parser.add_argument("--start-id", type=int, default=1, help="первый id субъекта")
+    parser.add_argument("--create-tables", action="store_true", help="создать таблицы, если их нет")
+    parser.add_argument("--seed", type=int, help="зерно для воспроизводимых данных")
+    parser.add_argument("--date", type=date.fromisoformat,
+                        help="дата событий и отсчета дат, YYYY-MM-DD (по умолчанию сегодня)")
+    args = parser.parse_args()
+
+    persons, events, elapsed = load(args.dsn, args.persons, args.batch_size,
+                                    args.workers or os.cpu_count(), args.loaders,
+                                    engine.EventMix(per_subject=args.events), args.start_id,
+                                    args.create_tables, args.seed,
+                                    args.date.isoformat() if args.date else None)
+    print(f"Загружено субъектов: {persons}, событий: {events} за {elapsed:.2f} с "
+          f"({persons / elapsed:.0f} субъектов/с)")
@@ -0,0 +1,374 @@
+from datetime import date
+from multiprocessing import Event, Process, Queue, Value, freeze_support
+from queue import Empty, Full
+from threading import Lock, Thread, local
+import xml.etree.ElementTree as ET
+import argparse
+import json
+import time
+import traceback
+
+import engine
+import gen
+from persons import PersonBatch
+from sinks import COMPRESSIONS, SINK_KINDS, open_sink, parse_size
+from validator import InvalidDocument, validate_text
+
+# Конвейер генерации: generate -> build -> serialize -> write.
+# Между стадиями ограниченные очереди: если следующая стадия не успевает,
+# предыдущая ждет (обратное давление), и память не растет. Стадии CPU
+# работают в процессах, запись со сжатием - в потоках основного процесса,
+# так что диск и компрессор работают одновременно с генерацией.
+# По каждой стадии собираются обработанные элементы, занятость воркеров
+# и глубина входной очереди - по ним видно, где узкое место.
+# Стадия validate между serialize и write включается числом воркеров
+# (--stage-workers validate=2) и останавливает конвейер на первом
+# документе с ошибками.
+
+POLL = 0.1
+
+# Настройки прогона, в процессах стадий выставляются в configure
+config = None
+
+
+def configure(settings):
+    global config
+    config = settings
+    gen.setup_process(settings["pool_size"], 0, settings["seed"], settings["anchor"])
+
+
+# --- Стадии ---
+def generate(item):
+    # Значения для документа в том же порядке выборки, что и в stream_document,
+    # поэтому при --seed файлы совпадают с gen.py. Субъекты уходят в build
+    # столбцами PersonBatch: через очередь между процессами передаются
+    # массивы и общий словарь строк, а не тысячи отдельных записей
+    index, reg_number = item
+    if config["seed"] is not None:
+        engine.seed_streams(engine.derive_seed(config["seed"], index))
+    date_str, mix = config["date"], config["mix"]
+    persons, details = PersonBatch(), []
+    for _ in range(config["subjects"]):
+        persons.append(engine.generate_random_person())
+        details.append((engine.generate_prev_name(), engine.generate_prev_doc(),
+                        mix.event_values(date_str)))
+    return reg_number, persons, details
+
+
+def build(item):
+    reg_number, persons, details = item
+    date_str, mix = config["date"], config["mix"]
+    document = ET.Element("Document", engine.document_attrs(
+        reg_number, date_str, len(persons), len(persons) * mix.per_subject))
+    document.append(engine.build_source(date_str))
+    data = ET.SubElement(document, "Data")
+    for person, (prev_name, prev_doc, event_values) in zip(persons, details):
+        subject = ET.SubElement(data, "Subject_FL")
+        subject.append(engine.build_title(person, prev_name, prev_doc))
+        events = ET.SubElement(subject, "Events")
+        for i, values in event_values:
+            events.append(mix.types[i][1](values))
+    return reg_number, document
+
+
+def serialize(item):
+    reg_number, document = item
+    return reg_number, engine.prettify(document, config["pretty"])
+
+
+def validate(item):
+    reg_number, text = item
+    errors = validate_text(text)
+    if errors:
+        raise InvalidDocument(f"{reg_number}.xml", errors)
+    return item
+
+
+class Writer:
+    # Стадия записи: у каждого потока свой приемник, чтобы части архивов
+    # не делились между потоками
+    def __init__(self, sink):
+        self.sink = sink
+        self.local = local()
+        self.lock = Lock()
+        self.sinks = []
+
+    def __call__(self, item):
+        reg_number, text = item
+        sink = getattr(self.local, "sink", None)
+        if sink is None:
+            sink = self.local.sink = open_sink(**self.sink)
+            with self.lock:
+                self.sinks.append(sink)
+        with sink.document(f"{reg_number}.xml") as f:
+            f.write(text)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+# --- Механика конвейера ---
+def take(queue, failed):
+    while not failed.is_set():
+        try:
+            return queue.get(timeout=POLL)
+        except Empty:
+            pass
+    raise RuntimeError("pipeline stopped")
+
+
+def give(queue, item, failed):
+    while not failed.is_set():
+        try:
+            queue.put(item, timeout=POLL)
+            return
+        except Full:
+            pass
+    raise RuntimeError("pipeline stopped")
+
+
+def run_worker(func, inbox, outbox, items, busy, failed, errors, settings=None):
+    try:
+        if settings is not None:
+            configure(settings)
+        while True:
+            item = take(inbox, failed)
+            if item is None:
+                return
+            started = time.perf_counter()
+            result = func(item)
+            spent = time.perf_counter() - started
+            with items.get_lock():
+                items.value += 1
+            with busy.get_lock():
+                busy.value += spent
+            if outbox is not None:
+                give(outbox, result, failed)
+    except Exception:
+        if not failed.is_set():
+            errors.put(traceback.format_exc())
+            failed.set()
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, threads=False, queue_size=8):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.threads = threads
+        self.queue_size = queue_size
+        self.inbox = Queue(queue_size)
+        self.items = Value("q", 0)
+        self.busy = Value("d", 0.0)
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.samples = 0
+        self.handles = []
+
+    def start(self, outbox, failed, errors, settings):
+        for _ in range(self.workers):
+            if self.threads:
+                # Потоки живут в основном процессе, где config уже выставлен
+                handle = Thread(target=run_worker, daemon=True, args=(
+                    self.func, self.inbox, outbox, self.items, self.busy, failed, errors))
+            else:
+                handle = Process(target=run_worker, daemon=True, args=(
+                    self.func, self.inbox, outbox, self.items, self.busy, failed, errors, settings))
+            handle.start()
+            self.handles.append(handle)
+
+    def join(self):
+        for handle in self.handles:
+            handle.join()
+
+    def sample(self):
+        try:
+            depth = self.inbox.qsize()
+        except NotImplementedError:
+            # На macOS размер очереди недоступен
+            return
+        self.depth_sum += depth
+        self.depth_max = max(self.depth_max, depth)
+        self.samples += 1
+
+    def metrics(self, elapsed):
+        items, busy = self.items.value, self.busy.value
+        return {
+            "workers": self.workers,
+            "items": items,
+            "items_per_sec": round(items / elapsed, 1) if elapsed else 0,
+            "busy_sec": round(busy, 3),
+            "utilization": round(busy / (elapsed * self.workers), 3) if elapsed else 0,
+            "queue_size": self.queue_size,
+            "queue_depth_avg": round(self.depth_sum / self.samples, 2) if self.samples else None,
+            "queue_depth_max": self.depth_max if self.samples else None,
+        }
+
+
+class Pipeline:
+    def __init__(self, stages, settings, progress=0):
+        self.stages = stages
+        self.settings = settings
+        self.progress = progress
+        self.failed = Event()
+        self.errors = Queue()
+
+    def _feed(self, items):
+        first = self.stages[0]
+        try:
+            for item in items:
+                give(first.inbox, item, self.failed)
+            for _ in range(first.workers):
+                give(first.inbox, None, self.failed)
+        except RuntimeError:
+            pass
+
+    def _close_stage(self, stage, following):
+        # Когда все воркеры стадии закончили, следующей стадии - по стоп-сигналу на воркер
+        stage.join()
+        if following is not None:
+            try:
+                for _ in range(following.workers):
+                    give(following.inbox, None, self.failed)
+            except RuntimeError:
+                pass
+
+    def run(self, items):
+        configure(self.settings)
+        stages = self.stages
+        for stage, following in zip(stages, stages[1:] + [None]):
+            outbox = following.inbox if following else None
+            stage.start(outbox, self.failed, self.errors, self.settings)
+
+        helpers = [Thread(target=self._feed, args=(items,), daemon=True)]
+        helpers += [Thread(target=self._close_stage, args=pair, daemon=True)
+                    for pair in zip(stages, stages[1:] + [None])]
+        for helper in helpers:
+            helper.start()
+
+        started = time.perf_counter()
+        last_report = started
+        while helpers[-1].is_alive() and not self.failed.is_set():
+            helpers[-1].join(POLL)
+            for stage in stages:
+                stage.sample()
+            if self.progress and time.perf_counter() - last_report >= self.progress:
+                last_report = time.perf_counter()
+                print(self.status())
+        elapsed = time.perf_counter() - started
+
+        if self.failed.is_set():
+            for stage in stages:
+                for handle in stage.handles:
+                    if isinstance(handle, Process):
+                        handle.terminate()
+            raise RuntimeError(f"pipeline stage failed:\n{self.errors.get()}")
+        return {stage.name: stage.metrics(elapsed) for stage in stages}, elapsed
+
+    def status(self):
+        parts = []
+        for stage in self.stages:
+            try:
+                depth = stage.inbox.qsize()
+            except NotImplementedError:
+                depth = "?"
+            parts.append(f"{stage.name} {stage.items.value} q={depth}/{stage.queue_size}")
+        return " | ".join(parts)
+
+
+def report(metrics, elapsed):
+    print(f"{'стадия':<10} {'воркеры':>7} {'элементы':>9} {'эл/с':>9} {'занятость':>9} "
+          f"{'очередь ср/макс':>16}")
+    for name, m in metrics.items():
+        depth = "-" if m["queue_depth_avg"] is None else \
+            f"{m['queue_depth_avg']:.1f}/{m['queue_depth_max']} из {m['queue_size']}"
+        print(f"{name:<10} {m['workers']:>7} {m['items']:>9} {m['items_per_sec']:>9.1f} "
+              f"{m['utilization']:>9.0%} {depth:>16}")
+    bottleneck = max(metrics, key=lambda name: metrics[name]["utilization"])
+    print(f"Узкое место: {bottleneck}, всего {elapsed:.2f} с")
+
+
+def run_pipeline(count, out_dir=".", subjects=1, mix=engine.DEFAULT_EVENT_MIX, pretty=True,
+                 seed=None, date_str=None, run_id=None, pool_size=0, workers=None,
+                 queue_size=8, sink=None, progress=0):
+    # workers - число воркеров по стадиям, например {"generate": 2, "write": 2};
+    # validate без воркеров пропускается
+    workers = {"generate": 1, "build": 1, "serialize": 1, "validate": 0, "write": 1,
+               **(workers or {})}
+    anchor = date.fromisoformat(date_str) if date_str else None
+    date_for_doc = date_str or date.today().isoformat()
+    prefix = gen.run_prefix(date_for_doc, seed, run_id)
+    width = len(str(count - 1))
+    settings = {"seed": seed, "anchor": anchor, "date": date_for_doc, "mix": mix,
+                "subjects": subjects, "pretty": pretty, "pool_size": pool_size}
+    writer = Writer({"out_dir": out_dir, **(sink or {})})
+
+    stages = [
+        Stage("generate", generate, workers["generate"], queue_size=queue_size),
+        Stage("build", build, workers["build"], queue_size=queue_size),
+        Stage("serialize", serialize, workers["serialize"], queue_size=queue_size),
+    ]
+    if workers["validate"]:
+        stages.append(Stage("validate", validate, workers["validate"], queue_size=queue_size))
+    stages.append(Stage("write", writer, workers["write"], threads=True, queue_size=queue_size))
+    items = ((i, f"{prefix}_{i:0{width}d}") for i in range(count))
+    try:
+        return Pipeline(stages, settings, progress).run(items)
+    finally:
+        writer.close()
+
+
+def parse_workers(text):
+    # "generate=2,serialize=2,write=4"
+    workers = {}
+    for item in text.split(","):
+        name, _, value = item.strip().partition("=")
+        if name not in ("generate", "build", "serialize", "validate", "write") or not value.isdigit() \
+                or int(value) < 1:
+            raise argparse.ArgumentTypeError(f"bad stage workers: {item}")
+        workers[name] = int(value)
+    return workers
+
+
+if __name__ == "__main__":
+    freeze_support()
+    parser = argparse.ArgumentParser(description="Конвейерная генерация файлов событий")
+    parser.add_argument("--count", type=int, default=100, help="количество документов")
+    parser.add_argument("--out-dir", default=".", help="каталог для файлов")
+    parser.add_argument("--subjects", type=int, default=1, help="субъектов в документе")
+    parser.add_argument("--events", type=int, default=1, help="событий на субъекта")
+    parser.add_argument("--event-mix", default="FL_Event_1_1", help="коды событий с весами")
+    parser.add_argument("--compact", action="store_true", help="XML без отступов")
+    parser.add_argument("--pool-size", type=int, default=0, help="размер пулов значений Faker")
+    parser.add_argument("--seed", type=int, help="зерно, результат совпадает с gen.py --seed")
+    parser.add_argument("--date", help="дата документа, YYYY-MM-DD")
+    parser.add_argument("--run-id", help="часть имени файлов после sourceID")
+    parser.add_argument("--stage-workers", type=parse_workers, default={},
+                        help="воркеры по стадиям, например generate=2,serialize=2,write=2; "
+                             "validate=N включает проверку документов")
+    parser.add_argument("--queue-size", type=int, default=8, help="емкость очереди перед стадией")
+    parser.add_argument("--sink", choices=SINK_KINDS, default="dir", help="приемник документов")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--compression-level", type=int)
+    parser.add_argument("--rotate-docs", type=int, default=0)
+    parser.add_argument("--rotate-size", type=parse_size, default=0)
+    parser.add_argument("--progress", type=float, default=0,
+                        help="печатать состояние стадий каждые N секунд")
+    parser.add_argument("--metrics", help="сохранить метрики стадий в JSON")
+    args = parser.parse_args()
+
+    sink = {"kind": args.sink, "compression": args.compression, "level": args.compression_level,
+            "max_docs": args.rotate_docs, "max_bytes": args.rotate_size}
+    metrics, elapsed = run_pipeline(
+        args.count, args.out_dir, args.subjects,
+        engine.EventMix(engine.parse_event_mix(args.event_mix), args.events), not args.compact,
+        args.seed, args.date, args.run_id, args.pool_size, args.stage_workers,
+        args.queue_size, sink, args.progress)
+    report(metrics, elapsed)
+    print(f"Сгенерировано документов: {args.count} за {elapsed:.2f} с "
+          f"({args.count / elapsed:.1f} док/с)")
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            json.dump({"elapsed_sec": round(elapsed, 3), "stages": metrics}, f,
+                      ensure_ascii=False, indent=2)
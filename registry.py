@@ -0,0 +1,379 @@
+from datetime import date
+import xml.etree.ElementTree as ET
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+import engine
+import gen
+from persons import Person
+from sinks import COMPRESSIONS, SINK_KINDS, open_sink
+from uid_factory import UidFactory
+from xml_writer import XmlWriter
+
+# Реестр отправленных субъектов и событий в SQLite: по нему следующие
+# прогоны дописывают новые события уже известным субъектам и меняют
+# отправленные заявки, не перегенерируя и не перечитывая старые файлы.
+#   python registry.py new --count 100 --subjects 10          новые субъекты
+#   python registry.py append --count 20 --subjects 5          новые события
+#   python registry.py update --count 10 --events 3            изменения заявок (operationCode B)
+#   python registry.py lookup --inn 500100732259
+# Поиск по ИНН, СНИЛС и UID идет по B-tree индексам, случайный выбор - по
+# rowid (записи не удаляются, id идут подряд), поэтому и на десятках
+# миллионов записей каждая операция - O(log n). Реестр пишет один процесс.
+
+SUBJECT_COLUMNS = ("last_name", "first_name", "middle_name", "birth_date", "birth_place",
+                   "doc_series", "doc_num", "issue_date", "doc_issuer", "dept_code",
+                   "tax_num", "snils")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY,
+    last_name TEXT NOT NULL,
+    first_name TEXT NOT NULL,
+    middle_name TEXT NOT NULL,
+    birth_date TEXT NOT NULL,
+    birth_place TEXT NOT NULL,
+    doc_series TEXT NOT NULL,
+    doc_num TEXT NOT NULL,
+    issue_date TEXT NOT NULL,
+    doc_issuer TEXT NOT NULL,
+    dept_code TEXT NOT NULL,
+    tax_num TEXT NOT NULL,
+    snils TEXT NOT NULL,
+    prev_name TEXT NOT NULL,
+    prev_doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS subjects_tax_num ON subjects (tax_num);
+CREATE INDEX IF NOT EXISTS subjects_snils ON subjects (snils);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    subject_id INTEGER NOT NULL REFERENCES subjects (id),
+    code TEXT NOT NULL,
+    uid TEXT,
+    event_date TEXT NOT NULL,
+    operation_code TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS events_uid ON events (uid);
+CREATE INDEX IF NOT EXISTS events_subject ON events (subject_id);
+CREATE TABLE IF NOT EXISTS seeds (
+    command TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    PRIMARY KEY (command, seed)
+);
+"""
+
+INSERT_SUBJECT = (f"INSERT INTO subjects ({', '.join(SUBJECT_COLUMNS)}, prev_name, prev_doc) "
+                  f"VALUES ({', '.join('?' * (len(SUBJECT_COLUMNS) + 2))})")
+INSERT_EVENT = ("INSERT INTO events (subject_id, code, uid, event_date, operation_code, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)")
+
+
+class SubjectRegistry:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    # --- Запись ---
+    def add_subject(self, person, prev_name, prev_doc):
+        row = [getattr(person, field) for field in Person.__slots__]
+        row += [json.dumps(prev_name, ensure_ascii=False), json.dumps(prev_doc, ensure_ascii=False)]
+        cursor = self.db.execute(INSERT_SUBJECT, row)
+        return cursor.lastrowid
+
+    def add_events(self, subject_id, events):
+        # events - [(код события, значения), ...]
+        self.db.executemany(INSERT_EVENT, [
+            (subject_id, code, values.get("uid"), values["eventDate"],
+             values.get("operationCode", "A"), json.dumps(values, ensure_ascii=False))
+            for code, values in events
+        ])
+
+    def update_event(self, event_id, values):
+        self.db.execute("UPDATE events SET operation_code = ?, data = ? WHERE id = ?",
+                        (values.get("operationCode", "A"), json.dumps(values, ensure_ascii=False),
+                         event_id))
+
+    def add_seed(self, command, seed):
+        self.db.execute("INSERT INTO seeds (command, seed) VALUES (?, ?)", (command, seed))
+
+    def close(self):
+        # Незафиксированный документ отбрасывается: документы фиксируются
+        # в run() каждый в своей транзакции
+        self.db.close()
+
+    # --- Чтение ---
+    def subject(self, subject_id):
+        # (Person, предыдущее имя, предыдущий документ)
+        row = self.db.execute(f"SELECT {', '.join(SUBJECT_COLUMNS)}, prev_name, prev_doc "
+                              f"FROM subjects WHERE id = ?", (subject_id,)).fetchone()
+        if row is None:
+            raise KeyError(subject_id)
+        return Person(*row[:-2]), json.loads(row[-2]), json.loads(row[-1])
+
+    def event(self, event_id):
+        # (id события, id субъекта, код, значения)
+        row = self.db.execute("SELECT id, subject_id, code, data FROM events WHERE id = ?",
+                              (event_id,)).fetchone()
+        if row is None:
+            raise KeyError(event_id)
+        return row[0], row[1], row[2], json.loads(row[3])
+
+    def find_subjects(self, inn=None, snils=None):
+        column, value = ("tax_num", inn) if inn is not None else ("snils", snils)
+        return [row[0] for row in
+                self.db.execute(f"SELECT id FROM subjects WHERE {column} = ?", (value,))]
+
+    def find_event(self, uid):
+        row = self.db.execute("SELECT id FROM events WHERE uid = ?", (uid,)).fetchone()
+        return None if row is None else self.event(row[0])
+
+    def subject_events(self, subject_id):
+        return [self.event(row[0]) for row in
+                self.db.execute("SELECT id FROM events WHERE subject_id = ? ORDER BY id",
+                                (subject_id,))]
+
+    def seed_used(self, command, seed):
+        return self.db.execute("SELECT 1 FROM seeds WHERE command = ? AND seed = ?",
+                               (command, seed)).fetchone() is not None
+
+    def last_id(self, table):
+        # max(id) берется из конца B-tree, в отличие от count(*) без полного прохода
+        return self.db.execute(f"SELECT max(id) FROM {table}").fetchone()[0] or 0
+
+    def random_ids(self, table, count, rnd):
+        last = self.last_id(table)
+        return rnd.sample(range(1, last + 1), min(count, last))
+
+
+# --- Документы ---
+def write_subjects(sink, reg_number, date_str, subjects):
+    # subjects - [(person, prev_name, prev_doc, [(код, значения), ...]), ...];
+    # orderNum нумеруется заново внутри документа
+    group_blocks = sum(len(events) for *_, events in subjects)
+    with sink.document(f"{reg_number}.xml") as f:
+        writer = XmlWriter(f, multiline_root=True)
+        writer.declaration()
+        writer.start("Document", engine.document_attrs(reg_number, date_str, len(subjects),
+                                                       group_blocks))
+        writer.element(engine.build_source(date_str))
+        writer.start("Data")
+        for person, prev_name, prev_doc, events in subjects:
+            subject = ET.Element("Subject_FL")
+            subject.append(engine.build_title(person, prev_name, prev_doc))
+            block = ET.SubElement(subject, "Events")
+            for order_num, (code, values) in enumerate(events, 1):
+                block.append(engine.EVENT_TYPES[code][1]({**values, "orderNum": str(order_num)}))
+            writer.element(subject)
+        writer.end("Data")
+        writer.end("Document")
+        writer.close()
+    return sink.location
+
+
+def new_events(mix, date_str):
+    return [(mix.codes[i], values) for i, values in mix.event_values(date_str)]
+
+
+def new_subjects(registry, count, mix, date_str):
+    # Порядок выборки тот же, что в stream_document: с зерном документ
+    # совпадает с gen.py --seed
+    subjects = []
+    for _ in range(count):
+        person = engine.generate_random_person()
+        prev_name = engine.generate_prev_name()
+        prev_doc = engine.generate_prev_doc()
+        events = new_events(mix, date_str)
+        registry.add_events(registry.add_subject(person, prev_name, prev_doc), events)
+        subjects.append((person, prev_name, prev_doc, events))
+    return subjects
+
+
+def append_events(registry, subject_ids, mix, date_str):
+    subjects = []
+    for subject_id in subject_ids:
+        events = new_events(mix, date_str)
+        registry.add_events(subject_id, events)
+        subjects.append((*registry.subject(subject_id), events))
+    return subjects
+
+
+def next_stage(values, operation_code, date_str):
+    stage = int(values.get("stageCode", "1")) + 1
+    return {**values, "operationCode": operation_code, "stageCode": str(stage),
+            "stageDate": date_str}
+
+
+def update_events(registry, event_ids, operation_code, date_str):
+    # Измененные заявки группируются по субъекту: Subject_FL на субъекта
+    grouped = {}
+    for event_id in event_ids:
+        _, subject_id, code, values = registry.event(event_id)
+        values = next_stage(values, operation_code, date_str)
+        registry.update_event(event_id, values)
+        grouped.setdefault(subject_id, []).append((code, values))
+    return [(*registry.subject(subject_id), events) for subject_id, events in grouped.items()]
+
+
+def selected_subjects(registry, inns, snilses):
+    ids = []
+    for kind, values in (("inn", inns), ("snils", snilses)):
+        for value in values:
+            found = registry.find_subjects(**{kind: value})
+            if not found:
+                raise SystemExit(f"unknown {kind} {value}")
+            ids += found
+    return ids
+
+
+def selected_events(registry, uids):
+    ids = []
+    for uid in uids:
+        event = registry.find_event(uid)
+        if event is None:
+            raise SystemExit(f"unknown uid {uid}")
+        ids.append(event[0])
+    return ids
+
+
+def run(args, registry):
+    # Документы new/append/update; возвращает число записанных документов
+    date_str = args.date or date.today().isoformat()
+    if args.date:
+        engine.use_anchor_date(date.fromisoformat(args.date))
+    engine.use_uids(UidFactory(engine.fake if args.seed is not None else None))
+    if args.seed is None:
+        engine.seed_streams(int.from_bytes(os.urandom(8), "big"))
+    mix = engine.EventMix(engine.parse_event_mix(args.event_mix), args.events)
+    prefix = gen.run_prefix(date_str, args.seed, args.run_id)
+    if args.command != "new":
+        prefix += f"_{args.command}"
+
+    # Явно заданные субъекты или заявки делятся на документы по --subjects
+    if args.command == "append" and (args.inn or args.snils):
+        chosen = selected_subjects(registry, args.inn, args.snils)
+    elif args.command == "update" and args.uid:
+        chosen = selected_events(registry, args.uid)
+    else:
+        chosen = None
+    # Документы с зерном повторяются при повторном запуске, а с ними и UID
+    # заявок, уже записанные в реестр: такой запуск отклоняется сразу
+    if args.seed is not None and registry.seed_used(args.command, args.seed):
+        raise SystemExit(f"seed {args.seed} was already used for '{args.command}' in this "
+                         f"registry, its documents would repeat stored UIDs; pass another --seed")
+    per_document = args.subjects if args.command != "update" else args.events
+    count = args.count if chosen is None else -(-len(chosen) // per_document)
+    width = len(str(max(count - 1, 0)))
+
+    sink = open_sink(args.sink, args.out_dir, args.compression)
+    try:
+        for i in range(count):
+            if args.seed is not None:
+                keys = (i,) if args.command == "new" else (args.command, i)
+                engine.seed_streams(engine.derive_seed(args.seed, *keys))
+            if chosen is not None:
+                ids = chosen[i * per_document:(i + 1) * per_document]
+            elif args.command != "new":
+                table = "subjects" if args.command == "append" else "events"
+                ids = registry.random_ids(table, per_document, engine.fake.random)
+                if not ids:
+                    raise SystemExit(f"registry has no {table} yet, run 'new' first")
+
+            # Документ - одна транзакция: реестр фиксируется после записи файла
+            # и не опережает файлы, при ошибке документ откатывается целиком
+            try:
+                with registry.db:
+                    if i == 0 and args.seed is not None:
+                        registry.add_seed(args.command, args.seed)
+                    if args.command == "new":
+                        subjects = new_subjects(registry, args.subjects, mix, date_str)
+                    elif args.command == "append":
+                        subjects = append_events(registry, ids, mix, date_str)
+                    else:
+                        subjects = update_events(registry, ids, args.operation_code, date_str)
+                    name = f"{prefix}_{i:0{width}d}" if count > 1 or args.command != "new" \
+                        else prefix
+                    write_subjects(sink, name, date_str, subjects)
+            except sqlite3.IntegrityError as e:
+                raise SystemExit(f"document {i} collides with the registry ({e}), "
+                                 f"documents before it are kept") from None
+    finally:
+        sink.close()
+    return count
+
+
+def lookup(args, registry):
+    if args.uid:
+        event = registry.find_event(args.uid)
+        subject_ids = [] if event is None else [event[1]]
+    else:
+        subject_ids = registry.find_subjects(inn=args.inn, snils=args.snils)
+    result = []
+    for subject_id in subject_ids:
+        person = registry.subject(subject_id)[0]
+        result.append({
+            "id": subject_id,
+            "person": dict(person.items()),
+            "events": [{"code": code, **values}
+                       for _, _, code, values in registry.subject_events(subject_id)],
+        })
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Реестр субъектов и дельта-генерация")
+    parser.add_argument("--db", default="registry.sqlite", help="файл реестра SQLite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("new", "новые субъекты с событиями"),
+                            ("append", "новые события существующих субъектов"),
+                            ("update", "изменения отправленных заявок")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--count", type=int, default=1,
+                             help="документов (без --inn/--snils/--uid)")
+        command.add_argument("--subjects", type=int, default=1, help="субъектов в документе")
+        command.add_argument("--events", type=int, default=1,
+                             help="событий на субъекта; для update - заявок в документе")
+        command.add_argument("--event-mix", default="FL_Event_1_1", help="коды событий с весами")
+        command.add_argument("--out-dir", default=".", help="каталог для файлов")
+        command.add_argument("--sink", choices=SINK_KINDS, default="dir")
+        command.add_argument("--compression", choices=COMPRESSIONS, default="none")
+        command.add_argument("--seed", type=int, help="зерно для воспроизводимых документов")
+        command.add_argument("--date", help="дата документа, YYYY-MM-DD")
+        command.add_argument("--run-id", help="часть имени файлов после sourceID")
+        if name == "append":
+            command.add_argument("--inn", action="append", default=[], help="ИНН субъекта")
+            command.add_argument("--snils", action="append", default=[], help="СНИЛС субъекта")
+        if name == "update":
+            command.add_argument("--uid", action="append", default=[], help="UID заявки")
+            command.add_argument("--operation-code", default="B", help="operationCode изменения")
+
+    lookup_parser = commands.add_parser("lookup", help="найти субъекта и его события")
+    key = lookup_parser.add_mutually_exclusive_group(required=True)
+    key.add_argument("--inn")
+    key.add_argument("--snils")
+    key.add_argument("--uid")
+    commands.add_parser("stats", help="число субъектов и событий")
+    args = parser.parse_args()
+
+    registry = SubjectRegistry(args.db)
+    try:
+        if args.command == "lookup":
+            found = lookup(args, registry)
+            print(json.dumps(found, ensure_ascii=False, indent=2))
+            sys.exit(0 if found else 1)
+        elif args.command == "stats":
+            print(f"Субъектов: {registry.last_id('subjects')}, "
+                  f"событий: {registry.last_id('events')}")
+        else:
+            os.makedirs(args.out_dir, exist_ok=True)
+            done = run(args, registry)
+            print(f"Документов: {done}, в реестре субъектов: {registry.last_id('subjects')}, "
+                  f"событий: {registry.last_id('events')}")
+    finally:
+        registry.close()
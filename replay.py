@@ -0,0 +1,346 @@
+from collections import deque
+from datetime import date
+from itertools import count as counter
+from math import cos, expm1, log1p, pi, sin
+from multiprocessing import Pool, freeze_support
+import argparse
+import io
+import json
+import os
+import signal
+import time
+
+import engine
+import gen
+from sinks import COMPRESSIONS, SINK_KINDS, open_sink, parse_size
+from xml_writer import XmlWriter
+
+# Выдача документов с заданной скоростью для нагрузочных прогонов приема:
+#   python replay.py --rate 500 --duration 28800 --out-dir out
+#   python replay.py --rate 200 --profile bursty --burst-rate 1000 --burst-every 60 --burst-length 5
+#   python replay.py --rate 300 --profile diurnal --period 3600 --amplitude 0.8
+# Документы генерируют процессы-воркеры заранее (буфер --buffer документов),
+# основной процесс только отпускает их в приемник по token bucket. Поэтому
+# неровности генерации не попадают в расписание, пока буфер не опустел.
+# В конце выводятся целевая и достигнутая скорость, задержка выдачи
+# относительно расписания (p50/p99/max, до записи в приемник) и сколько раз
+# документ опоздал из-за пустого буфера.
+
+# Последние доли секунды перед отправкой ждем активно: sleep просыпается с опозданием
+SPIN = 0.0002
+
+
+# --- Профили нагрузки ---
+# rate(t) - документов в секунду на t-й секунде прогона,
+# total(t) - сколько документов должно быть выдано к этому моменту
+class Constant:
+    def __init__(self, rate):
+        self.base = rate
+
+    def rate(self, t):
+        return self.base
+
+    def total(self, t):
+        return self.base * t
+
+
+class Bursty:
+    # Каждые every секунд - всплеск burst_rate длиной length секунд
+    def __init__(self, rate, burst_rate, every, length):
+        if not 0 < length < every:
+            raise ValueError("burst length must be shorter than the burst period")
+        self.base = rate
+        self.burst_rate = burst_rate
+        self.every = every
+        self.length = length
+
+    def rate(self, t):
+        return self.burst_rate if t % self.every < self.length else self.base
+
+    def total(self, t):
+        cycles, rest = divmod(t, self.every)
+        in_burst = min(rest, self.length)
+        per_cycle = self.burst_rate * self.length + self.base * (self.every - self.length)
+        return cycles * per_cycle + self.burst_rate * in_burst + self.base * (rest - in_burst)
+
+
+class Diurnal:
+    # Суточный ход: минимум в начале периода, пик в середине, в среднем rate.
+    # Период можно сжать, например до часа, чтобы пройти сутки быстрее.
+    def __init__(self, rate, period=86400, amplitude=0.8):
+        if not 0 <= amplitude < 1:
+            raise ValueError("amplitude must be in [0, 1)")
+        self.base = rate
+        self.period = period
+        self.amplitude = amplitude
+
+    def rate(self, t):
+        return self.base * (1 - self.amplitude * cos(2 * pi * t / self.period))
+
+    def total(self, t):
+        phase = 2 * pi * t / self.period
+        return self.base * (t - self.amplitude * self.period / (2 * pi) * sin(phase))
+
+
+PROFILES = ("constant", "bursty", "diurnal")
+
+
+class TokenBucket:
+    # Token bucket в виде расписания: tat - момент появления следующего
+    # токена при скорости профиля. Пока выдача отстает (медленная запись,
+    # пустой буфер), токены копятся, но не больше capacity: после задержки
+    # уходит до capacity документов подряд, дальше - снова по расписанию.
+    # Мелкие опоздания догоняются, и средняя скорость не проседает.
+    def __init__(self, profile, capacity=10):
+        self.profile = profile
+        self.capacity = capacity
+        self.tat = 0.0
+
+    def due(self):
+        return self.tat
+
+    def take(self, now):
+        # Опоздавший документ плюс не больше capacity - 1 накопленных токенов.
+        # Догон идет по текущей скорости: скорость на момент отставания
+        # (например, во всплеске) дала бы лишние документы подряд
+        interval = 1 / self.profile.rate(max(self.tat, now))
+        self.tat = max(self.tat, now - (self.capacity - 1) * interval) + interval
+
+
+class LatencyHistogram:
+    # Логарифмические корзины с шагом около 2%: память не зависит от
+    # длины прогона, процентили - с той же точностью
+    SCALE = 50
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        key = int(log1p(seconds * 1e6) * self.SCALE)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        rank = q * self.count
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return min(expm1((key + 1) / self.SCALE) / 1e6, self.max)
+        return 0.0
+
+
+# --- Воркеры ---
+# Настройки прогона, в воркерах выставляются в configure
+config = None
+
+
+def configure(settings):
+    # Ctrl+C останавливает прогон в основном процессе, воркеры его не получают
+    global config
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    config = settings
+    gen.setup_process(settings["pool_size"], 0, settings["seed"], settings["anchor"])
+
+
+def render_chunk(task):
+    # Документы start..stop целиком в памяти; тот же путь, что gen.write_document,
+    # поэтому с --seed файлы совпадают с gen.py
+    start, stop = task
+    date_str, mix, subjects, pretty = config["date"], config["mix"], config["subjects"], \
+        config["pretty"]
+    documents = []
+    for i in range(start, stop):
+        if config["seed"] is not None:
+            engine.seed_streams(engine.derive_seed(config["seed"], i))
+        reg_number = f"{config['prefix']}_{i:0{config['width']}d}"
+        out = io.StringIO()
+        if config["template"]:
+            engine.render_document(out, reg_number, date_str, subjects, mix, pretty)
+        else:
+            writer = XmlWriter(out, pretty=pretty, multiline_root=True)
+            engine.stream_document(writer, reg_number, date_str, subjects, mix)
+        documents.append((reg_number, out.getvalue()))
+    return documents
+
+
+# --- Выдача по расписанию ---
+def sleep_until(started, moment):
+    while True:
+        remaining = moment - (time.perf_counter() - started)
+        if remaining <= 0:
+            return
+        if remaining > SPIN:
+            time.sleep(remaining - SPIN)
+
+
+def replay(profile, count=0, duration=0, workers=1, chunk_size=20, buffer=1000, capacity=10,
+           sink=None, progress=0, subjects=1, mix=engine.DEFAULT_EVENT_MIX, pretty=True,
+           template=False, seed=None, date_str=None, run_id=None, pool_size=0):
+    # Выдает документы до count штук или duration секунд (0 - без ограничения,
+    # до Ctrl+C) и возвращает отчет прогона
+    date_for_doc = date_str or date.today().isoformat()
+    settings = {"seed": seed, "anchor": date.fromisoformat(date_str) if date_str else None,
+                "date": date_for_doc, "mix": mix, "subjects": subjects, "pretty": pretty,
+                "template": template, "pool_size": pool_size,
+                "prefix": gen.run_prefix(date_for_doc, seed, run_id),
+                "width": len(str(count - 1)) if count else 9}
+    starts = range(0, count, chunk_size) if count else counter(0, chunk_size)
+    tasks = ((start, min(start + chunk_size, count) if count else start + chunk_size)
+             for start in starts)
+
+    output = open_sink(**(sink or {}))
+    pool = Pool(workers, initializer=configure, initargs=(settings,))
+    pending = deque()
+    ready = deque()
+    queued = 0
+
+    def refill():
+        nonlocal queued
+        while queued < buffer:
+            task = next(tasks, None)
+            if task is None:
+                return
+            pending.append(pool.apply_async(render_chunk, (task,)))
+            queued += task[1] - task[0]
+
+    bucket = TokenBucket(profile, capacity)
+    latency = LatencyHistogram()
+    emitted = underruns = 0
+    started = time.perf_counter()
+    try:
+        # Перед стартом часов буфер заполняется целиком
+        refill()
+        for result in pending:
+            result.wait()
+        started = time.perf_counter()
+        last_report, last_emitted = 0.0, 0
+        while not count or emitted < count:
+            if not ready:
+                if not pending:
+                    break
+                waited = not pending[0].ready()
+                ready.extend(pending.popleft().get())
+                refill()
+                # Пустой буфер - недобор, только если из-за ожидания воркеров
+                # документ не успел к своему сроку
+                if waited and time.perf_counter() - started > bucket.due():
+                    underruns += 1
+            due = bucket.due()
+            if duration and due >= duration:
+                break
+            sleep_until(started, due)
+            # Задержка выдачи - от срока до момента выдачи, без записи в приемник
+            now = time.perf_counter() - started
+            bucket.take(now)
+            latency.observe(max(0.0, now - due))
+            reg_number, text = ready.popleft()
+            with output.document(f"{reg_number}.xml") as f:
+                f.write(text)
+            emitted += 1
+            queued -= 1
+            if progress and now - last_report >= progress:
+                target = (profile.total(now) - profile.total(last_report)) / (now - last_report)
+                print(f"{now:8.1f} с: {(emitted - last_emitted) / (now - last_report):8.1f} док/с "
+                      f"(цель {target:.1f}), в буфере {queued}, "
+                      f"p99 {latency.percentile(0.99) * 1000:.2f} мс")
+                last_report, last_emitted = now, emitted
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed = time.perf_counter() - started
+        pool.terminate()
+        pool.join()
+        output.close()
+    return {
+        "documents": emitted,
+        "elapsed_sec": round(elapsed, 3),
+        "target_documents": round(profile.total(elapsed)),
+        "target_rate": round(profile.total(elapsed) / elapsed, 2) if elapsed else 0,
+        "achieved_rate": round(emitted / elapsed, 2) if elapsed else 0,
+        "latency_p50_ms": round(latency.percentile(0.5) * 1000, 3),
+        "latency_p99_ms": round(latency.percentile(0.99) * 1000, 3),
+        "latency_max_ms": round(latency.max * 1000, 3),
+        "buffer_underruns": underruns,
+    }
+
+
+def make_profile(args):
+    if args.profile == "bursty":
+        return Bursty(args.rate, args.burst_rate or args.rate * 5, args.burst_every,
+                      args.burst_length)
+    if args.profile == "diurnal":
+        return Diurnal(args.rate, args.period, args.amplitude)
+    return Constant(args.rate)
+
+
+if __name__ == "__main__":
+    freeze_support()
+    parser = argparse.ArgumentParser(description="Выдача документов с заданной скоростью")
+    parser.add_argument("--rate", type=float, required=True,
+                        help="документов в секунду (для diurnal - в среднем)")
+    parser.add_argument("--profile", choices=PROFILES, default="constant", help="профиль нагрузки")
+    parser.add_argument("--burst-rate", type=float,
+                        help="bursty: скорость во время всплеска (по умолчанию 5 x --rate)")
+    parser.add_argument("--burst-every", type=float, default=60, help="bursty: период всплесков, с")
+    parser.add_argument("--burst-length", type=float, default=5, help="bursty: длина всплеска, с")
+    parser.add_argument("--period", type=float, default=86400, help="diurnal: длина суток, с")
+    parser.add_argument("--amplitude", type=float, default=0.8,
+                        help="diurnal: размах от среднего, доля от 0 до 1")
+    parser.add_argument("--duration", type=float, default=0,
+                        help="длительность прогона, с (0 - до --count или Ctrl+C)")
+    parser.add_argument("--count", type=int, default=0,
+                        help="сколько документов выдать (0 - без ограничения)")
+    parser.add_argument("--capacity", type=int, default=10,
+                        help="емкость token bucket: сколько документов можно выдать подряд, "
+                             "догоняя расписание после задержки")
+    parser.add_argument("--buffer", type=int, default=1000,
+                        help="заранее сгенерированных документов")
+    parser.add_argument("--chunk-size", type=int, default=20, help="документов на задачу воркера")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="процессов генерации (0 - по числу ядер без одного)")
+    parser.add_argument("--out-dir", default=".", help="каталог для файлов")
+    parser.add_argument("--subjects", type=int, default=1, help="субъектов в документе")
+    parser.add_argument("--events", type=int, default=1, help="событий на субъекта")
+    parser.add_argument("--event-mix", default="FL_Event_1_1", help="коды событий с весами")
+    parser.add_argument("--compact", action="store_true", help="XML без отступов")
+    parser.add_argument("--template", action="store_true", help="быстрый путь через шаблон")
+    parser.add_argument("--pool-size", type=int, default=0, help="размер пулов значений Faker")
+    parser.add_argument("--seed", type=int, help="зерно, результат совпадает с gen.py --seed")
+    parser.add_argument("--date", help="дата документа, YYYY-MM-DD")
+    parser.add_argument("--run-id", help="часть имени файлов после sourceID")
+    parser.add_argument("--sink", choices=SINK_KINDS, default="dir", help="приемник документов")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--compression-level", type=int)
+    parser.add_argument("--rotate-docs", type=int, default=0)
+    parser.add_argument("--rotate-size", type=parse_size, default=0)
+    parser.add_argument("--progress", type=float, default=0,
+                        help="печатать скорость и задержку каждые N секунд")
+    parser.add_argument("--metrics", help="сохранить отчет прогона в JSON")
+    args = parser.parse_args()
+    if args.rate <= 0:
+        parser.error("--rate must be positive")
+    try:
+        profile = make_profile(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    sink = {"kind": args.sink, "out_dir": args.out_dir, "compression": args.compression,
+            "level": args.compression_level, "max_docs": args.rotate_docs,
+            "max_bytes": args.rotate_size}
+    mix = engine.EventMix(engine.parse_event_mix(args.event_mix), args.events)
+    report = replay(profile, args.count, args.duration, args.workers or max(1, os.cpu_count() - 1),
+                    args.chunk_size, args.buffer, args.capacity, sink, args.progress,
+                    args.subjects, mix, not args.compact, args.template, args.seed, args.date,
+                    args.run_id, args.pool_size)
+    print(f"Выдано документов: {report['documents']} за {report['elapsed_sec']:.2f} с: "
+          f"{report['achieved_rate']:.1f} док/с при цели {report['target_rate']:.1f}")
+    print(f"Задержка выдачи: p50 {report['latency_p50_ms']:.2f} мс, "
+          f"p99 {report['latency_p99_ms']:.2f} мс, max {report['latency_max_ms']:.2f} мс; "
+          f"буфер пуст: {report['buffer_underruns']} раз")
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
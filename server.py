@@ -0,0 +1,329 @@
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from multiprocessing import Pipe, Process, freeze_support
+from queue import Queue
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Lock
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import json
+import os
+import signal
+import time
+
+import engine
+import gen
+from uid_factory import UidFactory
+from xml_writer import XmlWriter
+
+# Долгоживущий генератор: документы по запросу без запуска процесса.
+#   python server.py --port 8080 --workers 4
+#   curl "http://127.0.0.1:8080/document?subjects=3&events=2"
+#   python server.py --unix /tmp/events_gen.sock
+#   curl --unix-socket /tmp/events_gen.sock "http://localhost/document"
+# Документы генерируют процессы-воркеры с уже прогретыми Faker, пулами и
+# шаблонами. Воркер отдает документ кусками через свой канал, обработчик
+# сразу пересылает их клиенту (Transfer-Encoding: chunked), поэтому
+# большой документ не собирается в памяти целиком. Одновременно
+# обслуживается столько запросов, сколько воркеров; остальные ждут.
+
+CHUNK_SIZE = 1 << 16
+MAX_SUBJECTS = 1_000_000
+MAX_EVENTS = 1000
+# Сколько наборов пулов для запросов с зерном держит воркер
+SEEDED_POOLS = 4
+
+
+class ChunkWriter:
+    # Поток для XmlWriter/render_document: копит текст и отправляет его
+    # в канал кусками примерно по CHUNK_SIZE символов
+    def __init__(self, conn):
+        self.conn = conn
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.conn.send(("chunk", "".join(self.parts).encode("utf-8")))
+            self.parts = []
+            self.size = 0
+
+
+def write_document(out, request, template):
+    if template:
+        engine.render_document(out, request["reg_number"], request["date"], request["subjects"],
+                            request["mix"], request["pretty"])
+    else:
+        writer = XmlWriter(out, pretty=request["pretty"], multiline_root=True)
+        engine.stream_document(writer, request["reg_number"], request["date"], request["subjects"],
+                            request["mix"])
+
+
+def seeded_pools(cache, pool_size, seed, date_str):
+    # Пулы для запроса с зерном - те же, что строит gen.py --seed --pool-size:
+    # из потока derive_seed(seed, "pools") с отсчетом от даты запроса.
+    # Без обновления пулы не меняются, поэтому последние собранные хранятся
+    key = (seed, date_str)
+    pools = cache.get(key)
+    if pools is None:
+        if len(cache) >= SEEDED_POOLS:
+            del cache[next(iter(cache))]
+        pools = cache[key] = gen.build_pools(pool_size, seed=seed)
+    return pools
+
+
+def worker_main(conn, pool_size, template, validate_uids):
+    # Ctrl+C обрабатывает основной процесс, он же останавливает воркеры
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    gen.setup_process(pool_size, validate_uids=validate_uids)
+    pools = engine.pools
+    cache = {}
+    # Прогрев: шаблоны, пулы значений и кэши Faker строятся до первого запроса
+    with open(os.devnull, "w", encoding="utf-8") as null:
+        write_document(null, {"reg_number": "WARMUP", "date": engine.today().isoformat(),
+                              "subjects": 1, "mix": engine.DEFAULT_EVENT_MIX, "pretty": True},
+                       template)
+    while True:
+        request = conn.recv()
+        if request is None:
+            return
+        out = ChunkWriter(conn)
+        try:
+            if request["seed"] is not None:
+                # Запрос с зерном дает тот же документ, что gen.py --seed --date
+                engine.seed_streams(engine.derive_seed(request["seed"], 0))
+                engine.use_uids(UidFactory(engine.fake, validate=validate_uids))
+                engine.use_anchor_date(date.fromisoformat(request["date"]))
+                if pool_size:
+                    engine.use_pools(seeded_pools(cache, pool_size, request["seed"],
+                                                  request["date"]))
+            write_document(out, request, template)
+            out.flush()
+            conn.send(("end", None))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+        finally:
+            if request["seed"] is not None:
+                engine.seed_streams(int.from_bytes(os.urandom(8), "big"))
+                engine.use_uids(UidFactory(validate=validate_uids))
+                engine.use_anchor_date(None)
+                engine.use_pools(pools)
+
+
+class Worker:
+    def __init__(self, pool_size, template, validate_uids):
+        self.conn, child = Pipe()
+        self.process = Process(target=worker_main, daemon=True,
+                               args=(child, pool_size, template, validate_uids))
+        self.process.start()
+        child.close()
+
+
+class Generator:
+    # Пул воркеров: запрос берет свободный воркер и возвращает его после
+    # того, как дочитает из канала весь документ
+    def __init__(self, workers, pool_size=0, template=False, validate_uids=False):
+        self.settings = (pool_size, template, validate_uids)
+        self.workers = [Worker(*self.settings) for _ in range(workers)]
+        self.idle = Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.numbers = count(1)
+        self.lock = Lock()
+        self.served = 0
+        self.started = time.time()
+
+    def reg_number(self, request):
+        if request["seed"] is not None:
+            return gen.run_prefix(request["date"], request["seed"])
+        with self.lock:
+            number = next(self.numbers)
+        return f"{gen.BASE_ID}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{number:06d}"
+
+    def generate(self, request):
+        # Куски документа в байтах по мере генерации
+        worker = self.idle.get()
+        finished = False
+        try:
+            worker.conn.send(request)
+            while True:
+                kind, payload = worker.conn.recv()
+                if kind == "chunk":
+                    yield payload
+                    continue
+                finished = True
+                if kind == "error":
+                    raise RuntimeError(payload)
+                with self.lock:
+                    self.served += 1
+                return
+        finally:
+            self.release(worker, finished)
+
+    def release(self, worker, finished):
+        try:
+            # Если клиент отключился посреди документа, остаток все равно
+            # вычитывается, иначе следующий запрос получил бы чужие куски
+            while not finished:
+                finished = worker.conn.recv()[0] != "chunk"
+        except (EOFError, OSError):
+            # Воркер упал - на его место запускается новый
+            with self.lock:
+                self.workers.remove(worker)
+                worker = Worker(*self.settings)
+                self.workers.append(worker)
+        self.idle.put(worker)
+
+    def stats(self):
+        return {"workers": len(self.workers), "idle": self.idle.qsize(), "served": self.served,
+                "uptime_sec": round(time.time() - self.started, 1)}
+
+    def close(self):
+        for worker in self.workers:
+            worker.conn.send(None)
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+
+
+def parse_request(query):
+    # Параметры запроса -> задание воркеру; ValueError превращается в 400
+    params = {key: values[-1] for key, values in parse_qs(query, keep_blank_values=True).items()}
+    subjects = int(params.get("subjects", 1))
+    events = int(params.get("events", 1))
+    if not 1 <= subjects <= MAX_SUBJECTS:
+        raise ValueError(f"subjects must be between 1 and {MAX_SUBJECTS}")
+    if not 1 <= events <= MAX_EVENTS:
+        raise ValueError(f"events must be between 1 and {MAX_EVENTS}")
+    seed = int(params["seed"]) if "seed" in params else None
+    date_str = params.get("date") or engine.today().isoformat()
+    date.fromisoformat(date_str)
+    return {
+        "subjects": subjects,
+        "mix": engine.EventMix(engine.parse_event_mix(params.get("event_mix", "FL_Event_1_1")), events),
+        "pretty": params.get("compact", "0") in ("0", "false"),
+        "seed": seed,
+        "date": date_str,
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "events_gen"
+    # Ответ уходит несколькими записями (заголовки, куски, завершение);
+    # без TCP_NODELAY keep-alive клиент ждет задержанного ACK ~40 мс
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        generator = self.server.generator
+        if url.path == "/health":
+            self.send_json(200, generator.stats())
+            return
+        if url.path != "/document":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            request = parse_request(url.query)
+        except (ValueError, KeyError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        request["reg_number"] = generator.reg_number(request)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Reg-Number", request["reg_number"])
+        self.end_headers()
+        chunks = generator.generate(request)
+        try:
+            for chunk in chunks:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except RuntimeError as e:
+            # Заголовки уже ушли: обрываем ответ, клиент увидит незавершенный chunked
+            self.log_error("generation failed: %s", e)
+            self.close_connection = True
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            chunks.close()
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # У Unix-сокета нет адреса клиента
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class UnixHandler(Handler):
+    # TCP_NODELAY к Unix-сокету неприменим
+    disable_nagle_algorithm = False
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(generator, host="127.0.0.1", port=8080, unix=None, quiet=False):
+    # SIGTERM (systemd, docker stop) завершает сервер так же, как Ctrl+C
+    signal.signal(signal.SIGTERM, stop)
+    if unix:
+        if os.path.exists(unix):
+            os.unlink(unix)
+        server = ThreadingUnixHTTPServer(unix, UnixHandler)
+        where = unix
+    else:
+        server = ThreadingHTTPServer((host, port), Handler)
+        where = f"http://{host}:{server.server_port}"
+    server.generator = generator
+    server.quiet = quiet
+    print(f"Генератор слушает {where}, воркеров: {len(generator.workers)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        generator.close()
+        if unix and os.path.exists(unix):
+            os.unlink(unix)
+
+
+if __name__ == "__main__":
+    freeze_support()
+    parser = argparse.ArgumentParser(description="Сервер генерации документов по запросу")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", help="слушать Unix-сокет вместо TCP")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="процессов генерации (0 - по числу ядер)")
+    parser.add_argument("--pool-size", type=int, default=0, help="размер пулов значений Faker")
+    parser.add_argument("--template", action="store_true", help="шаблонный быстрый путь")
+    parser.add_argument("--validate-uids", action="store_true", help="проверять каждый UID")
+    parser.add_argument("--quiet", action="store_true", help="не писать журнал запросов")
+    args = parser.parse_args()
+
+    generator = Generator(args.workers or os.cpu_count(), args.pool_size, args.template,
+                          args.validate_uids)
+    serve(generator, args.host, args.port, args.unix, args.quiet)
@@ -0,0 +1,220 @@
+from contextlib import contextmanager
+import io
+import os
+import re
+
+# Приемники сгенерированных документов. На больших прогонах миллионы
+# отдельных файлов упираются в файловую систему (inode, метаданные),
+# поэтому документы можно складывать в сжатые потоки или архивы,
+# которые переключаются на новую часть по числу документов или размеру.
+#   dir     каждый документ - отдельный файл (как раньше)
+#   concat  документы подряд через перевод строки, можно gzip/zstd
+#   zip     документы - члены ZIP-архива (deflate)
+#   tar     документы - члены tar-архива, можно gzip/zstd
+# Части называются по первому документу в них, так что при --seed
+# имена не зависят от того, какой процесс их записал.
+# gzip, zipfile и tarfile импортируются при открытии приемника, чтобы
+# не замедлять запуск с обычной записью в каталог.
+
+SINK_KINDS = ("dir", "concat", "zip", "tar")
+COMPRESSIONS = ("none", "gzip", "zstd")
+EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+BUFFER_SIZE = 1 << 20
+SIZE_RE = re.compile(r"^(\d+)([KMG]?)$", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text):
+    # "500M", "2G", "65536" -> байты
+    match = SIZE_RE.match(text.strip())
+    if not match:
+        raise ValueError(f"Can't parse size: {text}")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
+
+
+def compressed_writer(raw, compression, level=None):
+    # Бинарный поток поверх raw, сжимающий все, что в него пишется.
+    # raw при закрытии сжатого потока не закрывается.
+    if compression == "none":
+        return raw
+    if compression == "gzip":
+        import gzip
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6 if level is None else level,
+                             mtime=0)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression requires the zstandard package: "
+                               "pip install zstandard") from None
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return compressor.stream_writer(raw, closefd=False)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class DirectorySink:
+    def __init__(self, out_dir=".", buffer_size=1 << 16):
+        self.out_dir = out_dir
+        self.buffer_size = buffer_size
+        self.documents = 0
+
+    @contextmanager
+    def document(self, name):
+        path = os.path.join(self.out_dir, name)
+        with open(path, "w", encoding="utf-8", buffering=self.buffer_size) as f:
+            yield f
+        self.documents += 1
+        self.location = path
+
+    def close(self):
+        pass
+
+
+class RotatingSink:
+    # Общая часть для приемников с частями: новая часть открывается
+    # перед документом, если текущая набрала max_docs или max_bytes.
+    # Размер считается по байтам на диске, то есть уже после сжатия, и
+    # отстает на содержимое буферов - граница части получается примерной.
+    extension = ""
+
+    def __init__(self, out_dir=".", max_docs=0, max_bytes=0, buffer_size=BUFFER_SIZE):
+        self.out_dir = out_dir
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.raw = None
+        self.path = None
+        self.part_docs = 0
+        self.documents = 0
+        self.parts = []
+
+    def _full(self):
+        if self.max_docs and self.part_docs >= self.max_docs:
+            return True
+        return bool(self.max_bytes) and self.raw.tell() >= self.max_bytes
+
+    def _next_part(self, name):
+        if self.raw is not None:
+            self._close_part()
+            self.raw.close()
+        self.path = os.path.join(self.out_dir, os.path.splitext(name)[0] + self.extension)
+        self.raw = open(self.path, "wb", buffering=self.buffer_size)
+        self.part_docs = 0
+        self.parts.append(self.path)
+        self._open_part()
+
+    @contextmanager
+    def document(self, name):
+        if self.raw is None or self._full():
+            self._next_part(name)
+        with self._member(name) as out:
+            yield out
+        self.part_docs += 1
+        self.documents += 1
+        self.location = f"{self.path}:{name}"
+
+    def close(self):
+        # Повторный вызов безопасен: close срабатывает и явно, и при выходе воркера
+        if self.raw is not None:
+            self._close_part()
+            self.raw.close()
+            self.raw = None
+
+
+class ConcatSink(RotatingSink):
+    # Документы пишутся подряд в один поток, после каждого - перевод строки.
+    # С --compact каждый документ занимает ровно одну строку.
+    def __init__(self, out_dir=".", compression="none", level=None, **kwargs):
+        super().__init__(out_dir, **kwargs)
+        self.compression = compression
+        self.level = level
+        self.extension = ".xml" + EXTENSIONS[compression]
+
+    def _open_part(self):
+        self.stream = compressed_writer(self.raw, self.compression, self.level)
+        # Буфер перед компрессором: zlib и zstd не любят мелкие записи
+        buffered = io.BufferedWriter(self.stream, self.buffer_size) \
+            if self.stream is not self.raw else self.raw
+        self.text = io.TextIOWrapper(buffered, encoding="utf-8", newline="\n")
+
+    @contextmanager
+    def _member(self, name):
+        yield self.text
+        self.text.write("\n")
+
+    def _close_part(self):
+        self.text.detach().flush()
+        if self.stream is not self.raw:
+            self.stream.close()
+
+
+class ZipSink(RotatingSink):
+    extension = ".zip"
+
+    def __init__(self, out_dir=".", level=None, **kwargs):
+        super().__init__(out_dir, **kwargs)
+        self.level = level
+
+    def _open_part(self):
+        import zipfile
+        self.archive = zipfile.ZipFile(self.raw, "w", zipfile.ZIP_DEFLATED, compresslevel=self.level)
+
+    @contextmanager
+    def _member(self, name):
+        # Член архива пишется потоком, без сборки документа в памяти
+        with self.archive.open(name, "w", force_zip64=True) as member:
+            text = io.TextIOWrapper(io.BufferedWriter(member, self.buffer_size), encoding="utf-8")
+            yield text
+            text.flush()
+            text.detach().flush()
+
+    def _close_part(self):
+        self.archive.close()
+
+
+class TarSink(RotatingSink):
+    def __init__(self, out_dir=".", compression="none", level=None, **kwargs):
+        super().__init__(out_dir, **kwargs)
+        self.compression = compression
+        self.level = level
+        self.extension = ".tar" + EXTENSIONS[compression]
+
+    def _open_part(self):
+        import tarfile
+        self.stream = compressed_writer(self.raw, self.compression, self.level)
+        self.archive = tarfile.open(fileobj=self.stream, mode="w|", bufsize=self.buffer_size)
+
+    @contextmanager
+    def _member(self, name):
+        # Заголовку tar нужен размер заранее, поэтому документ собирается в памяти
+        buf = io.StringIO()
+        yield buf
+        import tarfile
+        data = buf.getvalue().encode("utf-8")
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = 0o644
+        self.archive.addfile(info, io.BytesIO(data))
+
+    def _close_part(self):
+        self.archive.close()
+        if self.stream is not self.raw:
+            self.stream.close()
+
+
+def open_sink(kind="dir", out_dir=".", compression="none", level=None, max_docs=0, max_bytes=0):
+    os.makedirs(out_dir, exist_ok=True)
+    if kind == "dir":
+        if compression != "none":
+            raise ValueError("compression requires --sink concat or tar")
+        return DirectorySink(out_dir)
+    rotation = {"max_docs": max_docs, "max_bytes": max_bytes}
+    if kind == "concat":
+        return ConcatSink(out_dir, compression, level, **rotation)
+    if kind == "zip":
+        if compression != "none":
+            raise ValueError("zip archives are always deflate-compressed")
+        return ZipSink(out_dir, level, **rotation)
+    if kind == "tar":
+        return TarSink(out_dir, compression, level, **rotation)
+    raise ValueError(f"Unknown sink: {kind}")
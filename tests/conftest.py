@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Модули лежат в корне репозитория, page object - в Gen_Events_page_Object
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Gen_Events_page_Object"))
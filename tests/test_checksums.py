@@ -0,0 +1,38 @@
+import pytest
+
+import engine
+
+SAMPLES = 20000
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    engine.seed_streams(2024)
+
+
+def test_generated_inn_pass_validator():
+    assert all(engine.validate_inn(engine.generate_valid_inn()) for _ in range(SAMPLES))
+    assert all(engine.validate_inn(inn) for inn in engine.generate_valid_inns(SAMPLES))
+
+
+def test_generated_snils_pass_validator():
+    assert all(engine.validate_snils(engine.generate_valid_snils()) for _ in range(SAMPLES))
+    assert all(engine.validate_snils(snils) for snils in engine.generate_valid_snilses(SAMPLES))
+
+
+def test_wrong_check_digits_rejected():
+    for _ in range(1000):
+        inn, snils = engine.generate_valid_inn(), engine.generate_valid_snils()
+        assert not engine.validate_inn(inn[:11] + str((int(inn[11]) + 1) % 10))
+        assert not engine.validate_snils(f"{snils[:9]}{(int(snils[9:]) + 1) % 100:02d}")
+
+
+@pytest.mark.parametrize("value", ["", "12345", "1234567890ab", "7707083893"])
+def test_malformed_inn_rejected(value):
+    assert not engine.validate_inn(value)
+
+
+def test_known_values():
+    assert engine.validate_inn("500100732259")
+    assert engine.validate_snils("11223344595")
+    assert not engine.validate_snils("11223344596")
@@ -0,0 +1,104 @@
+import io
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import engine
+from pages.document_page import (DocumentBuilder, EventPage, generate_person,
+                                 register_event_page, render_document)
+from xml_writer import XmlWriter
+
+# Сверка page object API с ядром: при одном зерне DocumentBuilder и
+# функции engine.py (которыми пользуется gen.py) должны давать один и тот же
+# документ. Форматирование у генераторов разное (атрибуты корня, перевод
+# строки в конце), поэтому сравнивается канонический XML без отступов.
+
+REG_NUMBER = "YP01MM000001_CHECK"
+DATE_STR = "2024-05-17"
+SEEDS = [engine.derive_seed("cross_check", i) for i in range(50)]
+
+
+def canonical(text):
+    return ET.canonicalize(text, strip_text=True)
+
+
+def core_stream(seed, subjects, events):
+    engine.seed_streams(seed)
+    out = io.StringIO()
+    mix = engine.EventMix(per_subject=events)
+    engine.stream_document(XmlWriter(out, multiline_root=True), REG_NUMBER, DATE_STR,
+                           subjects, mix)
+    return out.getvalue()
+
+
+def page_stream(seed, subjects, events):
+    engine.seed_streams(seed)
+    out = io.StringIO()
+    builder = DocumentBuilder(generate_person(), REG_NUMBER, DATE_STR, events)
+    builder.write(XmlWriter(out, final_newline=True), subjects)
+    return out.getvalue()
+
+
+def core_tree(seed, events):
+    engine.seed_streams(seed)
+    mix = engine.EventMix(per_subject=events)
+    document = engine.build_document(engine.generate_random_person(), REG_NUMBER, DATE_STR, mix)
+    return engine.prettify(document)
+
+
+def page_tree(seed, events):
+    engine.seed_streams(seed)
+    builder = DocumentBuilder(generate_person(), REG_NUMBER, DATE_STR, events)
+    return engine.prettify(builder.build())
+
+
+@pytest.mark.parametrize("i", range(len(SEEDS)))
+def test_page_object_matches_core(i):
+    seed, subjects, events = SEEDS[i], 1 + i % 4, 1 + i % 3
+    assert canonical(page_stream(seed, subjects, events)) == \
+        canonical(core_stream(seed, subjects, events))
+    assert page_tree(seed, events) == core_tree(seed, events)
+
+
+def test_render_document_matches_core():
+    # То, что пишет xml_generator.py через gen.write_document(render=...)
+    mix = engine.EventMix(per_subject=2)
+    for seed in SEEDS[:10]:
+        engine.seed_streams(seed)
+        out = io.StringIO()
+        render_document(out, REG_NUMBER, DATE_STR, 3, mix)
+        assert canonical(out.getvalue()) == canonical(core_stream(seed, 3, 2))
+
+
+@pytest.fixture
+def page_event():
+    @register_event_page("FL_Event_Check")
+    class CheckEvent(EventPage):
+        code = "FL_Event_Check"
+
+        def build(self):
+            event = ET.Element(self.code, {"operationCode": "A", "orderNum": str(self.order_num),
+                                           "eventDate": self.date_str})
+            ET.SubElement(event, "uid").text = self.uid
+            return event
+
+    yield CheckEvent.code
+    engine.EVENT_TYPES.pop(CheckEvent.code)
+    engine.TREE_EVENTS.discard(CheckEvent.code)
+
+
+@pytest.mark.parametrize("pretty", [True, False])
+def test_page_event_in_template_path(page_event, pretty):
+    # Событие страницы в шаблонном пути пишется через build() и дает те же
+    # байты, что и потоковая запись
+    mix = engine.EventMix({"FL_Event_1_1": 1, page_event: 1}, per_subject=3)
+    for seed in SEEDS[:10]:
+        engine.seed_streams(seed)
+        stream = io.StringIO()
+        engine.stream_document(XmlWriter(stream, pretty=pretty, multiline_root=True),
+                               REG_NUMBER, DATE_STR, 2, mix)
+        engine.seed_streams(seed)
+        template = io.StringIO()
+        engine.render_document(template, REG_NUMBER, DATE_STR, 2, mix, pretty)
+        assert template.getvalue() == stream.getvalue()
+        assert page_event in stream.getvalue()
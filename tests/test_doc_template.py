@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+import engine
+from xml_writer import XmlWriter
+
+# Шаблонный путь должен давать те же байты, что и потоковая запись
+REG_NUMBER = "YP01MM000001_CHECK"
+DATE_STR = "2024-05-17"
+CASES = [
+    (True, 1, 1),
+    (False, 1, 1),
+    (True, 3, 4),
+    (False, 2, 3),
+]
+
+
+def render(write, seed):
+    engine.seed_streams(seed)
+    out = io.StringIO()
+    write(out)
+    return out.getvalue().encode("utf-8")
+
+
+@pytest.mark.parametrize("pretty, subjects, events", CASES)
+def test_template_matches_stream(pretty, subjects, events):
+    mix = engine.EventMix(per_subject=events)
+
+    def via_stream(out):
+        writer = XmlWriter(out, pretty=pretty, multiline_root=True)
+        engine.stream_document(writer, REG_NUMBER, DATE_STR, subjects, mix)
+
+    def via_template(out):
+        engine.render_document(out, REG_NUMBER, DATE_STR, subjects, mix, pretty)
+
+    for seed in range(50):
+        assert render(via_template, seed) == render(via_stream, seed), f"seed {seed}"
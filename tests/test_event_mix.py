@@ -0,0 +1,26 @@
+import pytest
+
+import engine
+import server
+from engine import EventMix, parse_event_mix
+
+
+@pytest.mark.parametrize("text", ["FL_Event_1_1=0", "FL_Event_1_1=-1", "FL_Event_1_1=nan",
+                                  "FL_Event_1_1=inf", "FL_Event_1_1=abc", "Unknown=1"])
+def test_bad_weights_rejected(text):
+    with pytest.raises(ValueError):
+        EventMix(parse_event_mix(text))
+
+
+def test_zero_weight_allowed_next_to_positive():
+    mix = EventMix({"FL_Event_1_1": 1, **{code: 0 for code in engine.EVENT_TYPES
+                                          if code != "FL_Event_1_1"}}, per_subject=20)
+    assert set(mix.pick()) == {0}
+
+
+@pytest.mark.parametrize("query", ["events=0", "event_mix=FL_Event_1_1%3D0",
+                                   "event_mix=FL_Event_1_1%3Dabc", "event_mix=Unknown"])
+def test_server_rejects_bad_mix(query):
+    # ValueError из parse_request обработчик отдает как 400 до начала ответа
+    with pytest.raises(ValueError):
+        server.parse_request(query)
@@ -0,0 +1,16 @@
+import pickle
+
+import engine
+from persons import PersonBatch
+
+
+def test_batch_round_trip():
+    # Столбцы PersonBatch после передачи между процессами дают те же записи
+    engine.seed_streams(2024)
+    persons = [engine.generate_random_person() for _ in range(500)]
+    batch = PersonBatch()
+    for person in persons:
+        batch.append(person)
+    restored = pickle.loads(pickle.dumps(batch))
+    assert len(restored) == len(persons)
+    assert list(restored) == persons
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import engine
+import pg_sink
+from pg_sink import CopySink, copy_line, load
+
+# Загрузка в базу проверяется только с PG_DSN, например
+#   PG_DSN="dbname=events_gen" python -m pytest tests/test_pg_sink.py
+PG_DSN = os.environ.get("PG_DSN")
+
+
+def test_copy_line_escaping():
+    assert copy_line((1, None, "a\tb", "c\nd", "e\\f", "g\rh")) == \
+        "1\t\\N\ta\\tb\tc\\nd\te\\\\f\tg\\rh\n"
+    assert copy_line(("Иванов", "")) == "Иванов\t\n"
+
+
+class BrokenConnection:
+    def cursor(self):
+        raise RuntimeError("connection lost")
+
+    def rollback(self):
+        raise RuntimeError("rollback failed")
+
+
+class BrokenPool:
+    def __init__(self, *args):
+        self.returned = []
+
+    def getconn(self):
+        return BrokenConnection()
+
+    def putconn(self, conn, close=False):
+        self.returned.append(close)
+
+    def closeall(self):
+        pass
+
+
+def test_loader_survives_failed_rollback(monkeypatch):
+    # Ошибка отката не убивает поток: очередь вычитывается, close() не виснет
+    monkeypatch.setattr(pg_sink, "ThreadedConnectionPool", BrokenPool)
+    sink = CopySink("", loaders=2, queue_size=1)
+    sink.put((1, 1, "", ""))
+    with pytest.raises(RuntimeError, match="connection lost"):
+        for _ in range(10):
+            sink.put((1, 1, "", ""))
+    with pytest.raises(RuntimeError, match="connection lost"):
+        sink.close()
+    assert sink.pool.returned and all(sink.pool.returned)
+
+
+@pytest.mark.skipif(not PG_DSN, reason="PG_DSN is not set")
+@pytest.mark.parametrize("workers", [1, 2])
+def test_load_into_postgres(workers):
+    import psycopg2
+
+    with psycopg2.connect(PG_DSN) as conn, conn.cursor() as cur:
+        cur.execute(pg_sink.CREATE_TABLES)
+        cur.execute("SELECT coalesce(max(id), 0) FROM persons")
+        start_id = cur.fetchone()[0] + 1
+    conn.close()
+
+    persons, events = 2500, 2
+    loaded, loaded_events, _ = load(PG_DSN, persons, batch_size=1000, workers=workers,
+                                    loaders=2, mix=engine.EventMix(per_subject=events),
+                                    start_id=start_id, create_tables=True, seed=3,
+                                    date_str="2024-05-17")
+    assert (loaded, loaded_events) == (persons, persons * events)
+
+    last_id = start_id + persons - 1
+    with psycopg2.connect(PG_DSN) as conn, conn.cursor() as cur:
+        cur.execute("SELECT count(*), min(id), max(id) FROM persons WHERE id BETWEEN %s AND %s",
+                    (start_id, last_id))
+        assert cur.fetchone() == (persons, start_id, last_id)
+        cur.execute("SELECT count(*), count(DISTINCT person_id) FROM events "
+                    "WHERE person_id BETWEEN %s AND %s", (start_id, last_id))
+        assert cur.fetchone() == (persons * events, persons)
+    conn.close()
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+from threading import Thread
+
+import pytest
+
+import engine
+import gen
+import pipeline
+from uid_factory import UidFactory
+
+# Конвейер при --seed пишет те же файлы, что gen.py, а ошибка в любой
+# стадии останавливает его исключением, а не зависанием
+
+DATE = "2024-05-17"
+
+
+@pytest.fixture(autouse=True)
+def process_state():
+    # Pipeline.run и generate_batch без пула настраивают текущий процесс
+    yield
+    engine.use_pools(None)
+    engine.use_anchor_date(None)
+    engine.use_uids(UidFactory(engine.fake))
+
+
+def documents(out_dir):
+    result = {}
+    for name in os.listdir(out_dir):
+        with open(os.path.join(out_dir, name), "rb") as f:
+            result[name] = f.read()
+    return result
+
+
+@pytest.mark.parametrize("pretty", [True, False])
+def test_pipeline_matches_gen(tmp_path, pretty):
+    mix = engine.EventMix(per_subject=2)
+    pipeline.run_pipeline(14, str(tmp_path / "pipeline"), subjects=3, mix=mix, pretty=pretty,
+                          seed=5, date_str=DATE, run_id="t", pool_size=40,
+                          workers={"generate": 2, "serialize": 2, "validate": 1, "write": 2})
+    gen.generate_batch(14, 2, 4, seed=5, date_str=DATE, run_id="t", pool_size=40,
+                       sink={"kind": "dir", "out_dir": str(tmp_path / "gen")},
+                       pretty=pretty, subjects=3, mix=mix)
+    expected = documents(tmp_path / "gen")
+    assert len(expected) == 14
+    assert documents(tmp_path / "pipeline") == expected
+
+
+def run_with_timeout(timeout=60, **kwargs):
+    # Исключение конвейера или None; зависание - провал теста
+    outcome = []
+
+    def target():
+        try:
+            pipeline.run_pipeline(**kwargs)
+            outcome.append(None)
+        except Exception as e:
+            outcome.append(e)
+
+    thread = Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline hangs after a stage failure"
+    return outcome[0]
+
+
+def test_failing_process_stage_raises(tmp_path, monkeypatch):
+    # Процессы стадий получают подмену через fork
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("stage processes are not forked")
+
+    def broken(*args):
+        raise ValueError("broken prev doc")
+
+    monkeypatch.setattr(engine, "generate_prev_doc", broken)
+    error = run_with_timeout(count=200, out_dir=str(tmp_path), seed=1, date_str=DATE,
+                             workers={"generate": 2, "build": 2}, queue_size=2)
+    assert isinstance(error, RuntimeError)
+    assert "broken prev doc" in str(error)
+
+
+def test_failing_writer_raises(tmp_path):
+    # Приемник не открывается: вместо каталога - файл
+    target = tmp_path / "file"
+    target.write_text("")
+    error = run_with_timeout(count=200, out_dir=str(target), seed=1, date_str=DATE,
+                             workers={"generate": 2, "write": 2}, queue_size=2)
+    assert isinstance(error, RuntimeError)
+    assert "stage failed" in str(error)
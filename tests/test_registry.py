@@ -0,0 +1,46 @@
+from argparse import Namespace
+
+import pytest
+
+from registry import SubjectRegistry, run
+
+
+def new_args(tmp_path, seed, **kwargs):
+    args = {"command": "new", "count": 2, "subjects": 2, "events": 2,
+            "event_mix": "FL_Event_1_1", "out_dir": str(tmp_path), "sink": "dir",
+            "compression": "none", "seed": seed, "date": "2024-05-17", "run_id": None}
+    return Namespace(**{**args, **kwargs})
+
+
+def counts(registry):
+    return registry.last_id("subjects"), registry.last_id("events")
+
+
+def test_repeated_seed_rejected(tmp_path):
+    registry = SubjectRegistry(str(tmp_path / "r.sqlite"))
+    run(new_args(tmp_path, 5), registry)
+    with pytest.raises(SystemExit, match="seed 5 was already used"):
+        run(new_args(tmp_path, 5, run_id="again"), registry)
+    assert counts(registry) == (4, 8)
+
+
+def test_collision_rolls_back_document(tmp_path):
+    # Без записи о зерне повтор упирается в уникальный UID; незаконченный
+    # документ откатывается и не оставляет субъектов без событий
+    path = str(tmp_path / "r.sqlite")
+    registry = SubjectRegistry(path)
+    run(new_args(tmp_path, 5), registry)
+    with registry.db:
+        registry.db.execute("DELETE FROM seeds")
+    with pytest.raises(SystemExit, match="collides with the registry"):
+        run(new_args(tmp_path, 5, run_id="again"), registry)
+    registry.close()
+    assert counts(SubjectRegistry(path)) == (4, 8)
+
+
+def test_unknown_inn_rejected(tmp_path):
+    registry = SubjectRegistry(str(tmp_path / "r.sqlite"))
+    run(new_args(tmp_path, 5), registry)
+    args = new_args(tmp_path, None, command="append", inn=["000000000000"], snils=[])
+    with pytest.raises(SystemExit, match="unknown inn"):
+        run(args, registry)
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from replay import Bursty, Constant, Diurnal, LatencyHistogram, TokenBucket
+
+
+def burst_after_stall(bucket, stall):
+    # Сколько документов уйдет подряд в момент stall, если до него выдача стояла
+    sent = 0
+    while bucket.due() <= stall:
+        bucket.take(stall)
+        sent += 1
+    return sent
+
+
+@pytest.mark.parametrize("capacity", [1, 3, 10])
+@pytest.mark.parametrize("profile", [Constant(100), Bursty(50, 500, 2, 0.5), Diurnal(200, 60)])
+def test_bucket_burst_limited_by_capacity(profile, capacity):
+    bucket = TokenBucket(profile, capacity)
+    for stall in (5.0, 12.3, 40.0):
+        assert burst_after_stall(bucket, stall) <= capacity
+        # Дальше - снова по расписанию: следующий документ не раньше stall
+        assert bucket.due() > stall
+
+
+def test_bucket_keeps_schedule_without_stall():
+    bucket = TokenBucket(Constant(100), capacity=10)
+    for _ in range(1000):
+        bucket.take(bucket.due())
+    assert bucket.due() == pytest.approx(10.0)
+
+
+def integral(rate, t, steps=200000):
+    # Метод средних прямоугольников
+    step = t / steps
+    return sum(rate((i + 0.5) * step) for i in range(steps)) * step
+
+
+@pytest.mark.parametrize("profile", [Bursty(10, 120, 7, 1.5), Diurnal(30, 50, 0.6)])
+@pytest.mark.parametrize("t", [0.9, 3.3, 7, 18.25, 101])
+def test_total_matches_rate_integral(profile, t):
+    # У Bursty скачки rate: погрешность метода - не больше шага на скачок
+    assert profile.total(t) == pytest.approx(integral(profile.rate, t), rel=1e-4, abs=1e-2)
+
+
+def test_histogram_percentile_within_bucket_error():
+    rng = random.Random(5)
+    samples = [rng.lognormvariate(-7, 1.5) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.observe(sample)
+    samples.sort()
+    # Корзина шириной 1/SCALE по log1p(мкс): граница выше значения не больше чем на ~2%
+    error = 1 / LatencyHistogram.SCALE
+    for q in (0.5, 0.9, 0.99, 0.999, 1.0):
+        exact = samples[max(0, int(q * len(samples)) - 1)]
+        assert exact <= histogram.percentile(q) <= exact * (1 + 2 * error) + 1e-6
+    assert histogram.percentile(1.0) == histogram.max
@@ -0,0 +1,59 @@
+import os
+import zipfile
+
+import pytest
+
+import engine
+import gen
+from uid_factory import UidFactory
+
+# Шарды и воркеры не влияют на результат: документ i зависит только от
+# (зерна, i), поэтому сумма шардов совпадает с прогоном на одном узле
+
+COUNT = 17
+
+
+@pytest.fixture(autouse=True)
+def process_state():
+    # generate_batch без пула настраивает состояние текущего процесса
+    yield
+    engine.use_pools(None)
+    engine.use_anchor_date(None)
+    engine.use_unique(None)
+    engine.use_uids(UidFactory(engine.fake))
+
+
+def documents(out_dir):
+    # Имя документа -> байты, из файлов и из членов архивов
+    result = {}
+    for root, _, names in os.walk(out_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if zipfile.is_zipfile(path):
+                with zipfile.ZipFile(path) as archive:
+                    result.update((member, archive.read(member)) for member in archive.namelist())
+            else:
+                with open(path, "rb") as f:
+                    result[name] = f.read()
+    return result
+
+
+def run(out_dir, shard, workers, kind, **options):
+    done, _ = gen.generate_batch(
+        COUNT, workers, 4, shard, seed=11, date_str="2024-05-17", pool_size=50,
+        sink={"kind": kind, "out_dir": str(out_dir), "max_docs": 3}, subjects=2,
+        mix=engine.EventMix(per_subject=2), **options)
+    return done
+
+
+@pytest.mark.parametrize("kind", ["dir", "zip"])
+@pytest.mark.parametrize("template", [False, True])
+def test_shards_match_single_node(tmp_path, kind, template):
+    assert run(tmp_path / "single", (0, 1), 1, kind, template=template) == COUNT
+    shards = 3
+    done = sum(run(tmp_path / "shards", (k, shards), 2, kind, template=template)
+               for k in range(shards))
+    assert done == COUNT
+    single = documents(tmp_path / "single")
+    assert len(single) == COUNT
+    assert documents(tmp_path / "shards") == single
@@ -0,0 +1,30 @@
+import random
+from uuid import UUID
+
+from uid_factory import HEX_DIGITS, UidFactory, validate_uid
+
+COUNT = 20000
+
+
+class Source:
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+
+def test_urandom_uids_valid_and_distinct():
+    factory = UidFactory()
+    uids = factory.uids(COUNT) + [factory.uid() for _ in range(COUNT)] + factory.uids(COUNT)
+    assert all(map(validate_uid, uids))
+    assert len(set(uids)) == len(uids)
+
+
+def test_seeded_uids_match_uuid4():
+    # Та же выборка, что у прежней генерации через uuid.UUID
+    rng = random.Random(1)
+    for uid in UidFactory(Source(1)).uids(COUNT):
+        assert uid == f"{UUID(int=rng.getrandbits(128), version=4)}-{rng.choice(HEX_DIGITS)}"
+
+
+def test_seeded_batch_equals_single_calls():
+    single = UidFactory(Source(7))
+    assert UidFactory(Source(7)).uids(100) == [single.uid() for _ in range(100)]
@@ -0,0 +1,49 @@
+import pytest
+
+from uid_factory import UidFactory, validate_uid
+from unique_ids import DuplicateCounter, FeistelPermutation, UniqueIds, UniqueUids
+
+
+@pytest.mark.parametrize("size", [1000, 1024, 9999])
+def test_permutation_is_bijection(size):
+    perm = FeistelPermutation(size, 42)
+    assert sorted(perm(i) for i in range(size)) == list(range(size))
+
+
+def test_document_ranges_do_not_overlap():
+    # Документы в любом порядке, как их раздают воркеры
+    ids = UniqueIds(7, {"inn": 3, "passport": 6}, documents=1000)
+    seen = set()
+    for index in reversed(range(1000)):
+        ids.document(index)
+        for _ in range(3):
+            seen.add(ids.next("inn"))
+    assert len(seen) == 3000
+
+
+def test_stride_and_capacity_enforced():
+    ids = UniqueIds(7, {"inn": 2}, documents=10)
+    ids.document(0)
+    ids.next("inn")
+    ids.next("inn")
+    with pytest.raises(ValueError):
+        ids.next("inn")
+    with pytest.raises(ValueError):
+        UniqueIds(7, {"snils": 10**6}, documents=10**6)
+
+
+def test_unique_uids_keep_format():
+    ids = UniqueIds(7, {"uid": 100}, documents=10)
+    uids = []
+    for index in range(10):
+        ids.document(index)
+        uids += UniqueUids(UidFactory(), ids).uids(100)
+    assert all(map(validate_uid, uids))
+    assert len(set(uids)) == len(uids)
+
+
+def test_duplicate_counter():
+    counter = DuplicateCounter(1 << 16)
+    for value in ["a", "b", "a", "c", "b"]:
+        counter.add("inn", value)
+    assert counter.report()["inn"]["duplicates"] == 2
@@ -0,0 +1,86 @@
+import io
+import os
+import tracemalloc
+
+import pytest
+
+import engine
+from sinks import open_sink
+from unique_ids import DuplicateCounter
+from validator import find_files, split_documents, validate_file
+from xml_writer import XmlWriter
+
+DATE_STR = "2024-05-17"
+
+
+def write_documents(sink, count):
+    engine.seed_streams(2024)
+    for i in range(count):
+        with sink.document(f"DOC_{i}.xml") as f:
+            engine.stream_document(XmlWriter(f, pretty=False), f"DOC_{i}", DATE_STR, 2)
+    sink.close()
+
+
+@pytest.mark.parametrize("kind, compression", [
+    ("dir", "none"), ("concat", "none"), ("concat", "gzip"), ("tar", "none"), ("tar", "gzip"),
+    ("zip", "none"),
+])
+def test_every_sink_validated(tmp_path, kind, compression):
+    write_documents(open_sink(kind, str(tmp_path), compression, max_docs=3), 7)
+    results = [result for path in find_files([str(tmp_path)]) for result in validate_file(path)]
+    assert len(results) == 7
+    assert all(not errors for _, errors in results)
+
+
+def test_concat_documents_named_by_reg_number(tmp_path):
+    write_documents(open_sink("concat", str(tmp_path)), 3)
+    path = os.path.join(tmp_path, "DOC_0.xml")
+    names = [name for name, _ in validate_file(path)]
+    assert names == [f"{path}:DOC_{i}.xml" for i in range(3)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 16])
+def test_split_documents_across_chunks(chunk_size):
+    text = b'<?xml version="1.0"?><a/>\n<?xml version="1.0"?><b/>\n'
+    documents, current = [], None
+    for data in split_documents(io.BytesIO(text), chunk_size):
+        if data is None:
+            current = []
+            documents.append(current)
+        else:
+            current.append(data)
+    assert [b"".join(parts) for parts in documents] == [
+        b'<?xml version="1.0"?><a/>\n', b'<?xml version="1.0"?><b/>\n']
+
+
+def test_broken_document_in_concat_reported(tmp_path):
+    write_documents(open_sink("concat", str(tmp_path)), 3)
+    path = os.path.join(tmp_path, "DOC_0.xml")
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data.replace(b"<Events>", b"<Events><Bogus/>", 1))
+    errors = [bool(errors) for _, errors in validate_file(path)]
+    assert errors == [True, False, False]
+
+
+def validation_peak(tmp_path, documents):
+    # Пиковая память проверки одной части concat из documents документов
+    out_dir = tmp_path / str(documents)
+    write_documents(open_sink("concat", str(out_dir)), documents)
+    path = os.path.join(out_dir, "DOC_0.xml")
+    duplicates = DuplicateCounter(1 << 16)
+    tracemalloc.start()
+    try:
+        checked = sum(1 for _ in validate_file(path, duplicates))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert checked == documents
+    return peak
+
+
+def test_concat_memory_flat(tmp_path):
+    # Документы части проверяются по одному: память не зависит от их числа
+    small, large = validation_peak(tmp_path, 50), validation_peak(tmp_path, 1000)
+    assert large < small * 1.5
@@ -0,0 +1,81 @@
+import random
+import xml.etree.ElementTree as ET
+from xml.dom import minidom
+
+import pytest
+
+import engine
+from persons import Person
+
+# XmlWriter заменил minidom: разметка должна совпадать с прежним prettify
+# байт в байт, в том числе для значений со спецсимволами
+
+DATE = "2024-05-17"
+INJECTED = ["&", "<", ">", '"', "'", "\t", "\n", "a & b", "<x>", 'say "hi"', "it's",
+            "  отступ ", "\n\tстрока\n", "&amp;", "]]>"]
+
+
+def old_prettify(elem):
+    # Копия prettify из gen.py до перехода на XmlWriter
+    rough_string = ET.tostring(elem, encoding="utf-8")
+    reparsed = minidom.parseString(rough_string)
+    xml_string = reparsed.toprettyxml(indent="    ", encoding="utf-8").decode("utf-8")
+
+    # Перенос атрибутов <Document ...> в столбик
+    lines = xml_string.splitlines()
+    new_lines = []
+    for line in lines:
+        if line.startswith("<Document "):
+            parts = line.replace("<Document ", "").rstrip(">").split('" ')
+            new_lines.append("<Document")
+            for part in parts:
+                if part:
+                    if not part.endswith('"'):
+                        part += '"'
+                    new_lines.append("    " + part.strip())
+            new_lines[-1] += ">"
+        else:
+            new_lines.append(line)
+    return "\n".join(new_lines)
+
+
+def inject(document, rng):
+    # Спецсимволы в тексты и атрибуты вложенных элементов; атрибуты корня
+    # прежний prettify разбирал по '" ', поэтому они не трогаются
+    for elem in document.iter():
+        if elem is document:
+            continue
+        if elem.text and rng.random() < 0.3:
+            elem.text = rng.choice(INJECTED) + elem.text + rng.choice(INJECTED)
+        for key in elem.attrib:
+            if rng.random() < 0.3:
+                elem.attrib[key] += rng.choice(INJECTED)
+        if not len(elem) and rng.random() < 0.05:
+            elem.text = rng.choice(INJECTED)
+
+
+@pytest.mark.parametrize("inject_values", [False, True])
+def test_prettify_matches_minidom(inject_values):
+    rng = random.Random(3)
+    mix = engine.EventMix(per_subject=2)
+    for i in range(150):
+        engine.seed_streams(engine.derive_seed(21, i))
+        document = engine.build_document(engine.generate_random_person(), f"REG_{i}", DATE, mix)
+        for _ in range(rng.randint(0, 2)):
+            document.find("Data").append(engine.build_subject_entry(
+                engine.generate_random_person(), DATE, mix))
+        if inject_values:
+            inject(document, rng)
+        assert engine.prettify(document) == old_prettify(document)
+
+
+def test_injected_values_round_trip():
+    # Экранирование обратимо: разбор вывода возвращает исходные значения
+    person = engine.generate_random_person()
+    document = engine.build_document(person, "REG", DATE)
+    leaves = [elem for elem in document.iter() if elem.text]
+    for elem, value in zip(leaves, INJECTED * 10):
+        elem.text = value
+    parsed = ET.fromstring(engine.prettify(document, pretty=False).encode())
+    assert [elem.text for elem in parsed.iter() if elem.text] == \
+        [elem.text for elem in leaves]
@@ -0,0 +1,82 @@
+import os
+import re
+
+# UID заявки FL_55_Application: UUIDv4 и суффикс из одного hex-символа,
+# например 3f2b8c1e-9a4d-4e21-b7c3-5d8e9f0a1b2c-7.
+# Без зерна UID нарезаются пачкой из одного буфера os.urandom: биты версии
+# и варианта выставляются прямо в hex-строке, без объектов uuid.UUID.
+# С зерном значения берутся из faker.random, как и все остальные поля,
+# в том же порядке выборки, что и прежний UUID(int=getrandbits(128), version=4).
+
+UID_RE = re.compile(r'^[a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[89ab][a-f0-9]{3}-[a-f0-9]{12}-[a-f0-9]$')
+HEX_DIGITS = "abcdef0123456789"
+# Верхние два бита ниббла варианта - 10: 0..f -> 8, 9, a, b
+VARIANT = {c: "89ab"[int(c, 16) & 3] for c in "0123456789abcdef"}
+# На один UID: 16 байт UUID и 1 байт на суффикс
+UID_BYTES = 17
+
+
+def validate_uid(uid: str) -> bool:
+    # Проверка UUIDv4 + суффикс из одного символа a-f0-9
+    return bool(UID_RE.match(uid))
+
+
+def format_uid(h):
+    # h - 34 hex-символа: 32 на UUID (ниббл версии отбрасывается), 2 на суффикс
+    return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{VARIANT[h[16]]}{h[17:20]}-{h[20:32]}-{h[33]}"
+
+
+def uids_from_bytes(data):
+    h = data.hex()
+    step = UID_BYTES * 2
+    return [format_uid(h[i:i + step]) for i in range(0, len(h) - step + 1, step)]
+
+
+class UidFactory:
+    # faker=None - UID из os.urandom пачками по batch штук,
+    # иначе из faker.random (воспроизводимо при заданном зерне).
+    # validate=True - каждый UID проверяется регулярным выражением.
+    def __init__(self, faker=None, batch=4096, validate=False):
+        self.faker = faker
+        self.batch = batch
+        self.validate = validate
+        self.buffer = []
+
+    def _seeded(self):
+        # faker.random читается при каждом вызове: seed_instance заменяет объект
+        rng = self.faker.random
+        h = f"{rng.getrandbits(128):032x}"
+        return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{VARIANT[h[16]]}{h[17:20]}-{h[20:]}-" \
+               f"{rng.choice(HEX_DIGITS)}"
+
+    def _check(self, uids):
+        for uid in uids:
+            if not UID_RE.match(uid):
+                raise ValueError(f"Generated UID is invalid: {uid}")
+
+    def uid(self):
+        if self.faker is not None:
+            uid = self._seeded()
+        else:
+            if not self.buffer:
+                self.buffer = uids_from_bytes(os.urandom(UID_BYTES * self.batch))
+            uid = self.buffer.pop()
+        if self.validate:
+            self._check((uid,))
+        return uid
+
+    def uids(self, count):
+        # Пачка UID, например на все события многосубъектного документа.
+        # С зерном порядок тот же, что у count вызовов uid().
+        if self.faker is not None:
+            uids = [self._seeded() for _ in range(count)]
+        else:
+            take = min(count, len(self.buffer))
+            uids = self.buffer[len(self.buffer) - take:]
+            del self.buffer[len(self.buffer) - take:]
+            if count > take:
+                uids += uids_from_bytes(os.urandom(UID_BYTES * (count - take)))
+        if self.validate:
+            self._check(uids)
+        return uids
+
@@ -0,0 +1,153 @@
+from math import exp
+import hashlib
+
+# Уникальные ИНН, СНИЛС, паспорта и UID в пределах прогона (gen.py --unique).
+# У документа с номером i для каждого вида идентификатора свой диапазон
+# порядковых номеров [i * stride, (i + 1) * stride): воркеры не пересекаются
+# без общей блокировки и без обмена сообщениями. Порядковый номер проходит
+# через ключевую перестановку (сеть Фейстеля), поэтому значения выглядят
+# случайными, но различны по построению. Память не зависит от размера прогона.
+# Счетчиков выданных значений при генерации нет: число значений и повторов
+# считается по готовым файлам, python validator.py out/ --duplicates
+# (DuplicateCounter, фильтр Блума).
+
+# Размеры пространств значений: префикс ИНН из 10 цифр, префикс СНИЛС из 9,
+# серия (1000-9999) и номер (100000-999999) паспорта, последние 48 бит UID
+SPACES = {
+    "inn": 9 * 10**9,
+    "snils": 9 * 10**8,
+    "passport": 9000 * 900000,
+    "uid": 1 << 48,
+}
+M64 = (1 << 64) - 1
+
+
+def mix64(value):
+    # splitmix64: перемешивание 64-битного числа
+    value = (value + 0x9E3779B97F4A7C15) & M64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & M64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & M64
+    return value ^ (value >> 31)
+
+
+class FeistelPermutation:
+    # Биекция [0, size) -> [0, size): сеть Фейстеля на четном числе бит и
+    # cycle walking - значения вне диапазона прогоняются через сеть повторно
+    ROUNDS = 4
+
+    def __init__(self, size, key):
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self.size = size
+        self.half = bits // 2
+        self.mask = (1 << self.half) - 1
+        self.keys = [mix64(key ^ mix64(r)) for r in range(self.ROUNDS)]
+
+    def __call__(self, value):
+        half, mask = self.half, self.mask
+        while True:
+            left, right = value >> half, value & mask
+            for key in self.keys:
+                left, right = right, left ^ (mix64(right ^ key) & mask)
+            value = (left << half) | right
+            if value < self.size:
+                return value
+
+
+class UniqueIds:
+    # strides - {вид: сколько значений этого вида нужно на документ},
+    # documents - число документов прогона (для проверки емкости)
+    def __init__(self, key, strides, documents):
+        for kind, stride in strides.items():
+            if stride * documents > SPACES[kind]:
+                raise ValueError(f"unique {kind} space holds {SPACES[kind] // stride} documents "
+                                 f"of this size, {documents} requested")
+        self.strides = strides
+        self.permutations = {kind: FeistelPermutation(SPACES[kind], mix64(key ^ i))
+                             for i, kind in enumerate(sorted(SPACES))}
+        self.next_seq = {}
+        self.stop_seq = {}
+
+    def document(self, index):
+        # Вызывается перед генерацией документа index
+        for kind, stride in self.strides.items():
+            self.next_seq[kind] = index * stride
+            self.stop_seq[kind] = (index + 1) * stride
+
+    def next(self, kind):
+        seq = self.next_seq[kind]
+        if seq >= self.stop_seq[kind]:
+            raise ValueError(f"document needs more than {self.strides[kind]} unique {kind} values")
+        self.next_seq[kind] = seq + 1
+        return self.permutations[kind](seq)
+
+    def passport(self):
+        value = self.next("passport")
+        return str(1000 + value // 900000), str(100000 + value % 900000)
+
+
+class UniqueUids:
+    # Обертка над UidFactory: последние 12 hex-символов UUID заменяются
+    # уникальным номером, формат и суффикс остаются прежними
+    def __init__(self, factory, ids):
+        self.factory = factory
+        self.ids = ids
+
+    def _unique(self, uid):
+        return f"{uid[:24]}{self.ids.next('uid'):012x}{uid[36:]}"
+
+    def uid(self):
+        return self._unique(self.factory.uid())
+
+    def uids(self, count):
+        return [self._unique(uid) for uid in self.factory.uids(count)]
+
+
+class BloomFilter:
+    def __init__(self, size_bytes, hashes=7):
+        self.bits = bytearray(size_bytes)
+        self.size = size_bytes * 8
+        self.hashes = hashes
+        self.count = 0
+
+    def add(self, value):
+        # True, если значение (вероятно) уже встречалось
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        bits, size = self.bits, self.size
+        seen = True
+        for i in range(self.hashes):
+            bit = (h1 + i * h2) % size
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                seen = False
+        self.count += 1
+        return seen
+
+    def false_positive_rate(self):
+        return (1 - exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class DuplicateCounter:
+    # Повторы идентификаторов по видам с фиксированной памятью: по фильтру
+    # Блума на вид. Ложные срабатывания возможны, их доля оценивается.
+    def __init__(self, size_bytes=16 << 20):
+        self.size_bytes = size_bytes
+        self.filters = {}
+        self.duplicates = {}
+
+    def add(self, kind, value):
+        bloom = self.filters.get(kind)
+        if bloom is None:
+            bloom = self.filters[kind] = BloomFilter(self.size_bytes)
+            self.duplicates[kind] = 0
+        if bloom.add(value):
+            self.duplicates[kind] += 1
+
+    def report(self):
+        return {kind: {"total": bloom.count, "duplicates": self.duplicates[kind],
+                       "rate": self.duplicates[kind] / bloom.count if bloom.count else 0,
+                       "false_positive_rate": bloom.false_positive_rate()}
+                for kind, bloom in sorted(self.filters.items())}
+
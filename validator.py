@@ -0,0 +1,536 @@
+from datetime import date
+from multiprocessing import Pool, Queue, freeze_support
+from threading import Thread
+import xml.etree.ElementTree as ET
+import argparse
+import os
+import re
+import sys
+import zipfile
+
+from engine import EVENT_TYPES, validate_inn, validate_snils
+from uid_factory import validate_uid
+from unique_ids import DuplicateCounter
+
+# Потоковая проверка документов schemaVersion 3.0 за один проход:
+# порядок элементов, пустые флаги (innChecked_0, prevNameFlag_1, ...),
+# контрольные суммы ИНН и СНИЛС, формат UID, даты, orderNum событий и
+# совпадение subjectsCount/groupBlocksCount с содержимым. Разобранные
+# Subject_FL сразу удаляются из дерева, поэтому память не зависит от
+# размера документа.
+#   python validator.py out/ --workers 4       проверка готовых файлов, частей
+#                                              concat и архивов zip и tar
+#   python validator.py out/ --duplicates      плюс доля повторов ИНН, СНИЛС,
+#                                              паспортов и UID во всех файлах
+#   gen.py --validate, pipeline.py --stage-workers validate=2   при генерации
+
+SCHEMA_VERSION = "3.0"
+DOCUMENT_ATTRS = ("schemaVersion", "ogrn", "sourceID", "regNumberDoc", "dateDoc", "inn",
+                  "subjectsCount", "groupBlocksCount", "regNumberDocInaccept")
+
+# Дочерние элементы в строгом порядке
+SEQUENCES = {
+    "Document": ("Source", "Data"),
+    "Source": ("FL_46_UL_36_OrgSource",),
+    "FL_46_UL_36_OrgSource": ("sourceCode", "sourceRegistrationFact_0", "fullName", "shortName",
+                              "otherName", "sourceDateStart", "regNum",
+                              "TaxNum_group_FL_46_UL_36_OrgSource", "sourceCreditInfoDate"),
+    "TaxNum_group_FL_46_UL_36_OrgSource": ("taxCode", "taxNum"),
+    "Subject_FL": ("Title", "Events"),
+    "Title": ("FL_1_4_Group", "FL_2_5_Group", "FL_3_Birth", "FL_6_Tax", "FL_7_Social"),
+    "FL_1_4_Group": ("FL_1_Name", "FL_4_Doc"),
+    "FL_1_Name": ("lastName", "firstName", "middleName"),
+    "FL_4_Doc": ("countryCode", "docCode", "docSeries", "docNum", "issueDate", "docIssuer",
+                 "deptCode", "foreignerCode"),
+    "FL_2_5_Group": ("FL_2_PrevName", "FL_5_PrevDoc"),
+    "FL_2_PrevName": ("prevNameFlag_1", "lastName", "firstName", "middleName", "date"),
+    "FL_5_PrevDoc": ("prevDocFact_1", "countryCode", "docCode", "docSeries", "docNum",
+                     "issueDate", "docIssuer", "deptCode", "endDate"),
+    "FL_3_Birth": ("birthDate", "countryCode", "birthPlace"),
+    "FL_6_Tax": ("TaxNum_group_FL_6_Tax", "regNum", "specialMode_0"),
+    "TaxNum_group_FL_6_Tax": ("taxCode", "taxNum", "innChecked_0"),
+    "FL_7_Social": ("socialNum",),
+    "FL_Event_1_1": ("FL_55_Application",),
+    "FL_55_Application": ("role", "sum", "currency", "uid", "applicationDate", "sourceCode",
+                          "wayCode", "stageEndDate", "purposeCode", "stageCode", "stageDate",
+                          "applicationCode", "num", "loanSum"),
+}
+# Повторяющиеся дочерние элементы: Data - субъекты, Events - события из реестра.
+# Структура событий без описания в SEQUENCES не проверяется.
+REPEATED = {"Data": ("Subject_FL",), "Events": tuple(EVENT_TYPES)}
+# Флаги - пустые элементы, остальные листья должны быть непустыми
+FLAGS = {"sourceRegistrationFact_0", "prevNameFlag_1", "prevDocFact_1", "innChecked_0",
+         "specialMode_0"}
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+DATE_TAGS = {"sourceDateStart", "sourceCreditInfoDate", "issueDate", "date", "endDate",
+             "birthDate", "applicationDate", "stageEndDate", "stageDate"}
+
+
+def valid_date(value):
+    if not DATE_RE.match(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+# (родитель, элемент) -> проверка значения
+VALUE_CHECKS = {
+    ("TaxNum_group_FL_6_Tax", "taxNum"): ("invalid INN checksum", validate_inn),
+    ("FL_7_Social", "socialNum"): ("invalid SNILS checksum", validate_snils),
+    ("FL_55_Application", "uid"): ("invalid UID format", validate_uid),
+}
+
+# Идентификаторы для подсчета повторов: (родитель, элемент) -> вид
+IDENTIFIERS = {
+    ("TaxNum_group_FL_6_Tax", "taxNum"): "inn",
+    ("FL_7_Social", "socialNum"): "snils",
+    ("FL_55_Application", "uid"): "uid",
+}
+# Паспорт - серия и номер вместе, текущий и прежний
+PASSPORT_TAGS = {"FL_4_Doc", "FL_5_PrevDoc"}
+
+# Файлы, которые ищутся в каталогах: выход всех приемников sinks.py
+COMPRESSED = ("", ".gz", ".zst")
+TAR_FILES = tuple(".tar" + ext for ext in COMPRESSED)
+DOCUMENT_FILES = tuple(".xml" + ext for ext in COMPRESSED) + TAR_FILES + (".zip",)
+DECLARATION = b"<?xml"
+
+
+class Frame:
+    __slots__ = ("elem", "position", "opaque")
+
+    def __init__(self, elem, opaque=False):
+        self.elem = elem
+        self.position = 0
+        self.opaque = opaque
+
+
+class DocumentValidator:
+    # Принимает XML кусками через feed() или write() (можно подставить
+    # как поток вывода), close() возвращает список ошибок.
+    # identifiers - получатель пар (вид, значение) с методом add(kind, value),
+    # например unique_ids.DuplicateCounter
+    def __init__(self, max_errors=20, identifiers=None):
+        self.parser = ET.XMLPullParser(("start", "end"))
+        self.max_errors = max_errors
+        self.identifiers = identifiers
+        self.errors = []
+        self.stack = []
+        self.root = None
+        self.subjects = 0
+        self.events = 0
+        self.subject_events = 0
+
+    def error(self, message):
+        if len(self.errors) < self.max_errors:
+            path = "/".join(frame.elem.tag for frame in self.stack)
+            if self.stack and self.stack[0].elem.tag == "Document" and len(self.stack) > 2:
+                path += f" (subject {self.subjects + 1})"
+            self.errors.append(f"{path}: {message}" if path else message)
+
+    def feed(self, data):
+        try:
+            self.parser.feed(data)
+        except ET.ParseError as e:
+            self.error(f"malformed XML: {e}")
+            return
+        self._process()
+
+    write = feed
+
+    def close(self):
+        try:
+            self.parser.close()
+        except ET.ParseError as e:
+            self.error(f"malformed XML: {e}")
+        self._process()
+        if self.root is None:
+            self.error("no <Document> element")
+        elif self.stack:
+            self.error("document is not closed")
+        return self.errors
+
+    def _process(self):
+        for event, elem in self.parser.read_events():
+            if event == "start":
+                self._start(elem)
+            else:
+                self._end(self.stack.pop(), elem)
+
+    def _start(self, elem):
+        tag = elem.tag
+        if not self.stack:
+            self.stack.append(Frame(elem))
+            self._document(elem)
+            return
+        parent = self.stack[-1]
+        if parent.opaque:
+            self.stack.append(Frame(elem, True))
+            return
+        parent_tag = parent.elem.tag
+        opaque = False
+        expected = SEQUENCES.get(parent_tag)
+        if expected is not None:
+            if parent.position >= len(expected):
+                self.error(f"unexpected <{tag}> after <{expected[-1]}>")
+            elif expected[parent.position] != tag:
+                self.error(f"unexpected <{tag}>, expected <{expected[parent.position]}>")
+            parent.position += 1
+        elif parent_tag in REPEATED:
+            if tag not in REPEATED[parent_tag]:
+                self.error(f"unexpected <{tag}>")
+            parent.position += 1
+            if parent_tag == "Events":
+                self._event(elem)
+                opaque = tag not in SEQUENCES
+        else:
+            self.error(f"unexpected <{tag}> inside a value element")
+        self.stack.append(Frame(elem, opaque))
+
+    def _end(self, frame, elem):
+        tag = elem.tag
+        if tag == "Subject_FL":
+            self.subjects += 1
+            self.subject_events = 0
+            # Проверенный субъект больше не нужен: память не растет
+            self.stack[-1].elem.remove(elem)
+        if frame.opaque:
+            return
+        self.stack.append(frame)
+        try:
+            self._check_end(frame, elem)
+        finally:
+            self.stack.pop()
+
+    def _check_end(self, frame, elem):
+        tag = elem.tag
+        expected = SEQUENCES.get(tag)
+        if expected is not None:
+            if frame.position < len(expected):
+                self.error(f"missing <{expected[frame.position]}>")
+            if tag == "Document":
+                self._counts(elem)
+            elif tag in PASSPORT_TAGS and self.identifiers is not None:
+                self.identifiers.add(
+                    "passport", f"{elem.findtext('docSeries')} {elem.findtext('docNum')}")
+            return
+        if tag in REPEATED:
+            if not frame.position:
+                self.error(f"no {' or '.join(REPEATED[tag])}")
+            return
+        text = elem.text or ""
+        if tag in FLAGS:
+            if text.strip():
+                self.error("flag element must be empty")
+            return
+        if not text.strip():
+            self.error("empty value")
+            return
+        if tag in DATE_TAGS and not valid_date(text):
+            self.error(f"invalid date {text!r}")
+        key = (self.stack[-2].elem.tag, tag)
+        check = VALUE_CHECKS.get(key)
+        if check is not None and not check[1](text):
+            self.error(f"{check[0]}: {text!r}")
+        if self.identifiers is not None and key in IDENTIFIERS:
+            self.identifiers.add(IDENTIFIERS[key], text)
+
+    def _document(self, elem):
+        self.root = elem
+        if elem.tag != "Document":
+            self.error(f"root element is <{elem.tag}>, expected <Document>")
+            return
+        missing = [name for name in DOCUMENT_ATTRS if name not in elem.attrib]
+        if missing:
+            self.error(f"missing attributes: {', '.join(missing)}")
+        if elem.get("schemaVersion", SCHEMA_VERSION) != SCHEMA_VERSION:
+            self.error(f"schemaVersion {elem.get('schemaVersion')!r}, expected {SCHEMA_VERSION!r}")
+        if not valid_date(elem.get("dateDoc", "0000-00-00")):
+            self.error(f"invalid dateDoc {elem.get('dateDoc')!r}")
+        if elem.get("regNumberDocInaccept") != elem.get("regNumberDoc"):
+            self.error("regNumberDocInaccept differs from regNumberDoc")
+
+    def _event(self, elem):
+        self.events += 1
+        self.subject_events += 1
+        order_num = elem.get("orderNum")
+        if order_num != str(self.subject_events):
+            self.error(f"<{elem.tag}> orderNum {order_num!r}, expected {self.subject_events}")
+        if not elem.get("operationCode"):
+            self.error(f"<{elem.tag}> without operationCode")
+        if not valid_date(elem.get("eventDate", "")):
+            self.error(f"<{elem.tag}> invalid eventDate {elem.get('eventDate')!r}")
+
+    def _counts(self, elem):
+        for name, actual in (("subjectsCount", self.subjects), ("groupBlocksCount", self.events)):
+            if elem.get(name) != str(actual):
+                self.error(f"{name}={elem.get(name)!r}, but document has {actual}")
+
+
+class ValidatingWriter:
+    # Пишет в out и параллельно отдает текст валидатору. Мелкие записи
+    # XmlWriter копятся и уходят в парсер кусками, так дешевле.
+    def __init__(self, out, validator, chunk_size=1 << 16):
+        self.out = out
+        self.validator = validator
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.out.write(text)
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.validator.feed("".join(self.parts))
+            self.parts = []
+            self.size = 0
+
+    def close(self):
+        self.flush()
+        return self.validator.close()
+
+
+class InvalidDocument(ValueError):
+    def __init__(self, name, errors):
+        super().__init__(f"{name}: {len(errors)} error(s)\n  " + "\n  ".join(errors))
+        self.name = name
+        self.errors = errors
+
+
+def validate_text(text):
+    validator = DocumentValidator()
+    validator.feed(text)
+    return validator.close()
+
+
+def validate_stream(stream, chunk_size=1 << 16, identifiers=None):
+    # stream - бинарный файл или член архива
+    validator = DocumentValidator(identifiers=identifiers)
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        validator.feed(data)
+    return validator.close()
+
+
+def split_documents(stream, chunk_size=1 << 16):
+    # Поток с документами подряд (concat) -> куски по документам, None
+    # отмечает начало следующего. Документ начинается с объявления <?xml,
+    # внутри документа эта последовательность встретиться не может.
+    # Хвост куска короче объявления ждет следующего куска
+    keep = len(DECLARATION) - 1
+    buf = b""
+    while True:
+        data = stream.read(chunk_size)
+        buf += data
+        while (i := buf.find(DECLARATION)) >= 0:
+            if i:
+                yield buf[:i]
+            yield None
+            yield DECLARATION
+            buf = buf[i + len(DECLARATION):]
+        if not data:
+            if buf:
+                yield buf
+            return
+        if len(buf) > keep:
+            yield buf[:-keep]
+            buf = buf[-keep:]
+
+
+def validate_documents(stream, path, identifiers=None, chunk_size=1 << 16):
+    # Файл .xml из одного документа или часть concat из многих: (имя, ошибки)
+    # по каждому документу, как только начался следующий. В памяти только
+    # текущий документ, сколько бы их ни было в части. Документы части
+    # называются по regNumberDoc, как в sinks: "часть:номер.xml"
+    def result(validator, number, single):
+        errors = validator.close()
+        reg_number = validator.root.get("regNumberDoc") if validator.root is not None else None
+        if single:
+            return path, errors
+        return (f"{path}:{reg_number}.xml" if reg_number else f"{path}:#{number}"), errors
+
+    # Первый документ ждет второго: только тогда ясно, назвать его по файлу или по номеру
+    first = current = None
+    number = 0
+    for data in split_documents(stream, chunk_size):
+        if data is None:
+            if current is not None:
+                if number == 1:
+                    first = result(current, 1, False)
+                else:
+                    if first is not None:
+                        yield first
+                        first = None
+                    yield result(current, number, False)
+            current = None
+            continue
+        if current is None:
+            current = DocumentValidator(identifiers=identifiers)
+            number += 1
+        current.feed(data)
+    if first is not None:
+        yield first
+    if current is None and number == 0:
+        # Пустой файл - ошибка "no <Document> element"
+        current, number = DocumentValidator(identifiers=identifiers), 1
+    if current is not None:
+        yield result(current, number, number == 1)
+
+
+def open_stream(path):
+    # Бинарный поток файла с распаковкой по расширению (sinks.EXTENSIONS)
+    if path.endswith(".gz"):
+        import gzip
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd files require the zstandard package: "
+                               "pip install zstandard") from None
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def validate_file(path, identifiers=None):
+    # (имя документа, ошибки) по мере проверки: у zip и tar - по документу
+    # на член архива, у части concat - на каждый документ в ней
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                with archive.open(name) as member:
+                    yield f"{path}:{name}", validate_stream(member, identifiers=identifiers)
+        return
+    with open_stream(path) as stream:
+        if path.endswith(TAR_FILES):
+            import tarfile
+            # Потоковое чтение: сжатый tar не нужно распаковывать целиком
+            with tarfile.open(fileobj=stream, mode="r|") as archive:
+                for member in archive:
+                    if member.isfile():
+                        yield (f"{path}:{member.name}",
+                               validate_stream(archive.extractfile(member), identifiers=identifiers))
+            return
+        yield from validate_documents(stream, path, identifiers)
+
+
+class IdentifierSender:
+    # Идентификаторы из воркера уходят в основной процесс пачками через
+    # ограниченную очередь, а не списками на файл: память воркера не растет
+    def __init__(self, queue, batch=4096):
+        self.queue = queue
+        self.batch = batch
+        self.items = []
+
+    def add(self, kind, value):
+        self.items.append((kind, value))
+        if len(self.items) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self.items:
+            self.queue.put(self.items)
+            self.items = []
+
+
+# Получатель идентификаторов текущего процесса (--duplicates)
+identifiers = None
+
+
+def init_worker(queue):
+    global identifiers
+    identifiers = IdentifierSender(queue) if queue is not None else None
+
+
+def check_file(path):
+    # Задача воркера: (проверено документов, [(имя, ошибки), ...] с ошибками)
+    checked, invalid = 0, []
+    for name, errors in validate_file(path, identifiers):
+        checked += 1
+        if errors:
+            invalid.append((name, errors))
+    if isinstance(identifiers, IdentifierSender):
+        identifiers.flush()
+    return checked, invalid
+
+
+def count_identifiers(queue, duplicates):
+    # Поток основного процесса: фильтры Блума общие для всех файлов
+    while (items := queue.get()) is not None:
+        for kind, value in items:
+            duplicates.add(kind, value)
+
+
+def find_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(DOCUMENT_FILES):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+if __name__ == "__main__":
+    freeze_support()
+    parser = argparse.ArgumentParser(description="Проверка сгенерированных документов")
+    parser.add_argument("paths", nargs="+",
+                        help="файлы .xml, .zip, .tar (можно .gz, .zst) или каталоги")
+    parser.add_argument("--workers", type=int, default=1, help="процессов (0 - по числу ядер)")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="посчитать повторы ИНН, СНИЛС, паспортов и UID во всех документах")
+    parser.add_argument("--bloom-mb", type=int, default=16,
+                        help="память фильтра Блума на вид идентификатора, МБ")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count()
+    files = find_files(args.paths)
+    # Идентификаторы считает основной процесс: фильтры Блума общие для всех
+    # файлов и занимают фиксированную память. Без пула они идут в счетчик
+    # прямо из валидатора, с пулом - пачками через очередь
+    duplicates = DuplicateCounter(args.bloom_mb << 20) if args.duplicates else None
+    checked = invalid = 0
+    if workers > 1:
+        queue = Queue(64) if duplicates is not None else None
+        if queue is not None:
+            counting = Thread(target=count_identifiers, args=(queue, duplicates), daemon=True)
+            counting.start()
+        pool = Pool(workers, initializer=init_worker, initargs=(queue,))
+        results = pool.imap_unordered(check_file, files, 4)
+    else:
+        identifiers = duplicates
+        pool = None
+        results = map(check_file, files)
+    for count, documents in results:
+        checked += count
+        for name, errors in documents:
+            invalid += 1
+            print(InvalidDocument(name, errors))
+    if pool:
+        pool.close()
+        pool.join()
+        if duplicates is not None:
+            # Воркеры завершились и дописали очередь, дальше - только конец
+            queue.put(None)
+            counting.join()
+    print(f"Проверено документов: {checked}, с ошибками: {invalid}")
+    if not checked:
+        # Пустой прогон - не успех: скорее всего, путь или формат не те
+        sys.exit("Документы не найдены")
+    if duplicates is not None:
+        for kind, stats in duplicates.report().items():
+            print(f"{kind}: {stats['total']} значений, повторов {stats['duplicates']} "
+                  f"({stats['rate']:.4%}), ложные срабатывания фильтра "
+                  f"~{stats['false_positive_rate']:.1e}")
+    sys.exit(1 if invalid else 0)
@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+import re
+
+# Пулы заранее сгенерированных значений Faker.
+# Вместо отдельного вызова fake.* на каждое поле значения генерируются
+# пачкой и дальше выбираются случайно. Размер пула ограничивает память,
+# периодическое обновление части пула возвращает разнообразие.
+
+DATE_OFFSET = re.compile(r"^([+-]?\d+)([yd])$")
+
+
+def parse_date_offset(spec, today):
+    # Те же обозначения, что у fake.date_between: "today", "-15y", "+10y", "-30d"
+    if spec == "today":
+        return today
+    match = DATE_OFFSET.match(spec)
+    if not match:
+        raise ValueError(f"Can't parse date offset: {spec}")
+    amount, unit = int(match.group(1)), match.group(2)
+    days = amount * 365.24 if unit == "y" else amount
+    return today + timedelta(days=days)
+
+
+def split_name(full_name):
+    parts = full_name.split()
+    while len(parts) < 3:
+        parts.append("")
+    return parts[0].upper(), parts[1].upper(), parts[2].upper()
+
+
+class ValuePool:
+    def __init__(self, faker, factory, size, refresh_every=0, refresh_fraction=0.1):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.faker = faker
+        self.factory = factory
+        self.size = size
+        self.refresh_every = refresh_every
+        self.refresh_count = max(1, int(size * refresh_fraction))
+        self.values = []
+        self.draws = 0
+
+    def fill(self):
+        self.values = [self.factory() for _ in range(self.size)]
+
+    def refresh(self):
+        # Вытесняем случайные ячейки свежими значениями, размер пула не растет
+        randrange = self.faker.random.randrange
+        for _ in range(self.refresh_count):
+            self.values[randrange(self.size)] = self.factory()
+
+    def get(self):
+        if not self.values:
+            self.fill()
+        if self.refresh_every:
+            self.draws += 1
+            if self.draws >= self.refresh_every:
+                self.draws = 0
+                self.refresh()
+        return self.values[self.faker.random.randrange(self.size)]
+
+
+class ValuePools:
+    # Набор пулов для полей субъекта. Пулы заполняются лениво, при первой
+    # выборке, поэтому в воркерах они строятся уже после пересева Faker.
+    # Значения генерирует source (по умолчанию тот же faker), а выборка
+    # из пулов идет через faker.random.
+    def __init__(self, faker, size=10000, refresh_every=0, refresh_fraction=0.1,
+                 today=None, source=None):
+        source = source or faker
+        self.faker = faker
+        self.source = source
+        self.size = size
+        self.refresh_every = refresh_every
+        self.refresh_fraction = refresh_fraction
+        self.today = today or date.today()
+        self.names = self.pool(lambda: split_name(source.name()))
+        self.cities = self.pool(lambda: source.city().upper())
+        self.issuers = self.pool(lambda: source.company().upper())
+        self.dates = {}
+
+    def pool(self, factory):
+        return ValuePool(self.faker, factory, self.size, self.refresh_every, self.refresh_fraction)
+
+    def name(self):
+        return self.names.get()
+
+    def city(self):
+        return self.cities.get()
+
+    def issuer(self):
+        return self.issuers.get()
+
+    def date(self, start, end):
+        # Границы диапазона вычисляются один раз, дальше только выборка из пула
+        pool = self.dates.get((start, end))
+        if pool is None:
+            lo = parse_date_offset(start, self.today).toordinal()
+            hi = parse_date_offset(end, self.today).toordinal()
+            pool = self.pool(
+                lambda: date.fromordinal(self.source.random.randint(lo, hi)).isoformat())
+            self.dates[(start, end)] = pool
+        return pool.get()
@@ -0,0 +1,93 @@
+import xml.etree.ElementTree as ET
+
+# Потоковая запись XML без промежуточного minidom.
+# Разметка совпадает с toprettyxml(indent="    "): элемент с текстом пишется
+# в одну строку, пустой элемент - как <tag/>, вложенные - с отступом 4 пробела.
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>'
+INDENT = "    "
+
+
+def escape(value: str) -> str:
+    # То же экранирование, что у minidom для текста и атрибутов
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if '"' in value:
+        value = value.replace('"', "&quot;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    return value
+
+
+class XmlWriter:
+    def __init__(self, out, pretty=True, multiline_root=False, final_newline=False):
+        self.out = out
+        self.pretty = pretty
+        self.multiline_root = multiline_root
+        self.final_newline = final_newline
+        self.depth = 0
+        self.started = False
+
+    def _pad(self, depth):
+        # Перевод строки пишется перед каждой строкой, кроме первой,
+        # поэтому в конце документа нет лишнего "\n"
+        if not self.pretty:
+            return ""
+        if not self.started:
+            self.started = True
+            return INDENT * depth
+        return "\n" + INDENT * depth
+
+    def declaration(self):
+        self.out.write(self._pad(0) + XML_DECLARATION)
+
+    def start(self, tag, attrib=None):
+        pad = self._pad(self.depth)
+        if not attrib:
+            self.out.write(f"{pad}<{tag}>")
+        elif self.pretty and self.multiline_root and self.depth == 0:
+            attrs = "".join(f'\n{INDENT}{k}="{escape(v)}"' for k, v in attrib.items())
+            self.out.write(f"{pad}<{tag}{attrs}>")
+        else:
+            attrs = "".join(f' {k}="{escape(v)}"' for k, v in attrib.items())
+            self.out.write(f"{pad}<{tag}{attrs}>")
+        self.depth += 1
+
+    def end(self, tag):
+        self.depth -= 1
+        self.out.write(f"{self._pad(self.depth)}</{tag}>")
+
+    def element(self, elem: ET.Element):
+        # Поддерево собирается в список и пишется одним вызовом write
+        parts = []
+        self._render(elem, self.depth, parts)
+        self.out.write("".join(parts))
+
+    def _render(self, elem, depth, parts):
+        pad = self._pad(depth)
+        tag = elem.tag
+        attrs = "".join(f' {k}="{escape(v)}"' for k, v in elem.attrib.items())
+        if len(elem):
+            parts.append(f"{pad}<{tag}{attrs}>")
+            for child in elem:
+                self._render(child, depth + 1, parts)
+            parts.append(f"{self._pad(depth)}</{tag}>")
+        elif elem.text:
+            parts.append(f"{pad}<{tag}{attrs}>{escape(elem.text)}</{tag}>")
+        else:
+            parts.append(f"{pad}<{tag}{attrs}/>")
+
+    def close(self):
+        if self.final_newline and self.pretty:
+            self.out.write("\n")
+
+    def document(self, root: ET.Element):
+        # Весь документ: объявление, корень с атрибутами, дочерние элементы
+        self.declaration()
+        self.start(root.tag, root.attrib)
+        for child in root:
+            self.element(child)
+        self.end(root.tag)
+        self.close()
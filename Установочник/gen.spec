@@ -1,34 +1,55 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# Сборка gen.py в каталог (onedir): pyinstaller Установочник/gen.spec
+# Однофайловый exe при каждом запуске распаковывает весь архив во временный
+# каталог, поэтому сборка идет в dist/gen/ и запускается dist/gen/gen.exe.
+# Из Faker берутся только провайдеры, которые подключает engine.py
+# (FAKER_PROVIDERS), и только нужные локали: Faker при импорте перебирает
+# все найденные провайдеры и их локали.
+# Замер запуска: python Установочник/startup_time.py dist/gen/gen.exe
+
+ROOT = os.path.dirname(SPECPATH)
+FAKER_PROVIDERS = ("person", "address", "company", "date_time")
+FAKER_LOCALES = ("ru_RU", "en_US")
+
+
+def keep(parts):
+    # parts - путь модуля или файла данных: faker, providers, <провайдер>, <локаль>, ...
+    if parts[:2] != ["faker", "providers"] or len(parts) < 3 or parts[2] == "__init__.py":
+        return True
+    if parts[2] not in FAKER_PROVIDERS:
+        return False
+    return len(parts) < 4 or parts[3] == "__init__.py" or parts[3] in FAKER_LOCALES
 
 
 a = Analysis(
-    ['gen.py'],
-    pathex=[],
+    [os.path.join(ROOT, 'gen.py')],
+    pathex=[ROOT],
     binaries=[],
     datas=[],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter', 'unittest', 'pydoc', 'doctest', 'pdb', 'lib2to3', 'xml.dom'],
     noarchive=False,
     optimize=0,
 )
+a.pure = [entry for entry in a.pure if keep(entry[0].split('.'))]
+a.datas = [entry for entry in a.datas if keep(entry[0].replace('\\', '/').split('/'))]
 pyz = PYZ(a.pure)
 
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='gen',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +57,12 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='gen',
+)
@@ -0,0 +1,46 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Замер холодного запуска сборки: сколько проходит от старта процесса
+# до готового файла с одним документом.
+#   python Установочник/startup_time.py dist/gen/gen.exe
+#   python Установочник/startup_time.py old/gen.exe dist/gen/gen.exe   сравнение
+# Вместо exe можно передать gen.py - тогда он запускается текущим python.
+
+
+def launch_time(target, out_dir):
+    command = [sys.executable, target] if target.endswith(".py") else [target]
+    started = time.perf_counter()
+    subprocess.run(command + ["--count", "1", "--out-dir", out_dir],
+                   stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+
+def measure(target, runs, warmup):
+    with tempfile.TemporaryDirectory() as out_dir:
+        # Первые запуски прогревают кэш файловой системы и не учитываются
+        for _ in range(warmup):
+            launch_time(target, out_dir)
+        return [launch_time(target, out_dir) for _ in range(runs)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замер времени запуска генератора")
+    parser.add_argument("targets", nargs="+", help="exe или gen.py; первый - база для сравнения")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    args = parser.parse_args()
+
+    medians = []
+    for target in args.targets:
+        times = measure(os.path.abspath(target), args.runs, args.warmup)
+        medians.append(statistics.median(times))
+        print(f"{target}: медиана {medians[-1] * 1000:.0f} мс, "
+              f"мин {min(times) * 1000:.0f} мс, макс {max(times) * 1000:.0f} мс")
+    for target, median in zip(args.targets[1:], medians[1:]):
+        print(f"{target}: быстрее в {medians[0] / median:.1f} раза")